@@ -1,37 +1,131 @@
-import uuid
+import base64
 import hashlib
-import secrets
+import hmac
+import json
+import os
+import uuid
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Cookie, status
 from fastapi.security import HTTPBearer
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
+from . import versions
+from .cache import TTLCache
 from .database import get_db
 
 security = HTTPBearer()
 
+# Validated sessions are cached so authenticated requests skip the sessions
+# lookup. Entries never outlive the session's own expiry.
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+SESSION_LIFETIME = timedelta(hours=24)
+
+# "database" keeps sessions in the sessions collection; "signed" issues
+# HMAC-signed tokens carrying user id, role and expiry, which validate
+# without a database read. Signed tokens are accepted in either mode while
+# signing keys are configured, so switching modes keeps users logged in.
+SESSION_MODE = os.getenv("SESSION_MODE", "database")
+
+# Comma-separated key_id:secret pairs. The first key signs new tokens; the
+# others still verify, so a key can be rotated out after SESSION_LIFETIME.
+SESSION_SIGNING_KEYS: Dict[str, bytes] = {
+    key_id.strip(): secret.strip().encode()
+    for key_id, secret in (
+        pair.split(":", 1)
+        for pair in os.getenv("SESSION_SIGNING_KEYS", "").split(",")
+        if pair.strip()
+    )
+}
+
+if SESSION_MODE == "signed" and not SESSION_SIGNING_KEYS:
+    raise RuntimeError("SESSION_MODE=signed requires SESSION_SIGNING_KEYS")
+
+SIGNED_TOKEN_PREFIX = "v1."
+
+# Revoked signed token id -> token expiry, mirrored from token_revocations
+revoked_tokens: Dict[str, datetime] = {}
+
+
+# Signed session tokens
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
 
-# Password hashing
-def hash_password(password: str) -> str:
-    """Hash a password for safe storage."""
-    salt = secrets.token_hex(16)
-    hash_obj = hashlib.sha256(f"{password}{salt}".encode())
-    return f"{salt}:{hash_obj.hexdigest()}"
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(key: bytes, message: str) -> str:
+    return _b64encode(hmac.new(key, message.encode(), hashlib.sha256).digest())
+
+
+def sign_session(user_id: str, role: str, expiry: datetime) -> str:
+    """Issue a signed session token, as v1.<key id>.<payload>.<signature>."""
+    key_id, key = next(iter(SESSION_SIGNING_KEYS.items()))
+    payload = {
+        "jti": uuid.uuid4().hex,
+        "uid": user_id,
+        "role": role,
+        "exp": int((expiry - datetime(1970, 1, 1)).total_seconds()),
+    }
+    message = (
+        f"{SIGNED_TOKEN_PREFIX}{key_id}.{_b64encode(json.dumps(payload).encode())}"
+    )
+    return f"{message}.{_signature(key, message)}"
+
+
+def verify_signed_session(token: str) -> Optional[Dict]:
+    """Get the payload of a signed token with a valid signature and expiry."""
+    try:
+        message, signature = token.rsplit(".", 1)
+        _, key_id, payload = message.split(".")
+    except ValueError:
+        return None
+
+    key = SESSION_SIGNING_KEYS.get(key_id)
+    if key is None or not hmac.compare_digest(_signature(key, message), signature):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+
+    claims["exp"] = datetime(1970, 1, 1) + timedelta(seconds=claims["exp"])
+    if claims["exp"] <= datetime.utcnow():
+        return None
+    return claims
+
+
+async def load_revoked_tokens(db=None):
+    """Mirror the unexpired signed token revocations into revoked_tokens."""
+    db = db if db is not None else get_db()
+    revoked = {}
+    cursor = db.token_revocations.find(
+        {"expiry": {"$gt": datetime.utcnow()}}, {"_id": 0, "jti": 1, "expiry": 1}
+    )
+    async for revocation in cursor:
+        revoked[revocation["jti"]] = revocation["expiry"]
+    revoked_tokens.clear()
+    revoked_tokens.update(revoked)
 
 
-def verify_password(stored_password: str, provided_password: str) -> bool:
-    """Verify a password against a stored hash."""
-    salt, stored_hash = stored_password.split(":", 1)
-    hash_obj = hashlib.sha256(f"{provided_password}{salt}".encode())
-    return secrets.compare_digest(hash_obj.hexdigest(), stored_hash)
+versions.subscribe("sessions", load_revoked_tokens)
 
 
 # Session management
 async def create_session(user_id: str, role: str):
     """Create a new user session."""
+    expiry = datetime.utcnow() + SESSION_LIFETIME
+    if SESSION_MODE == "signed":
+        return sign_session(user_id, role, expiry)
+
     db = get_db()
     session_id = str(uuid.uuid4())
-    expiry = datetime.utcnow() + timedelta(hours=24)
 
     await db.sessions.insert_one(
         {"session_id": session_id, "user_id": user_id, "role": role, "expiry": expiry}
@@ -47,19 +141,71 @@ async def validate_session(
     if not session_id:
         return False, None, None
 
+    if session_id.startswith(SIGNED_TOKEN_PREFIX) and SESSION_SIGNING_KEYS:
+        claims = verify_signed_session(session_id)
+        if not claims or claims["jti"] in revoked_tokens:
+            return False, None, None
+        return True, claims["uid"], claims["role"]
+
+    cached = session_cache.get(session_id)
+    if cached is not None:
+        return True, cached[0], cached[1]
+
     db = get_db()
     session = await db.sessions.find_one({"session_id": session_id})
 
     if not session:
         return False, None, None
 
-    if session["expiry"] < datetime.utcnow():
-        await db.sessions.delete_one({"session_id": session_id})
+    # Expired sessions are removed by the TTL index on expiry, which can
+    # lag behind by up to a minute
+    remaining = (session["expiry"] - datetime.utcnow()).total_seconds()
+    if remaining <= 0:
         return False, None, None
 
+    session_cache.set(session_id, (session["user_id"], session["role"]), remaining)
+
     return True, session["user_id"], session["role"]
 
 
+async def delete_session(session_id: str):
+    """Delete a session and evict it from every worker's session cache."""
+    db = get_db()
+
+    if session_id.startswith(SIGNED_TOKEN_PREFIX) and SESSION_SIGNING_KEYS:
+        # Signed tokens cannot be deleted, so they are revoked until expiry
+        claims = verify_signed_session(session_id)
+        if claims:
+            revoked_tokens[claims["jti"]] = claims["exp"]
+            await db.token_revocations.insert_one(
+                {"jti": claims["jti"], "expiry": claims["exp"]}
+            )
+            await versions.bump(db, "sessions")
+        return
+
+    session_cache.pop(session_id)
+
+    await db.sessions.delete_one({"session_id": session_id})
+    await db.session_revocations.insert_one(
+        {"session_id": session_id, "revoked": datetime.utcnow()}
+    )
+    await versions.bump(db, "sessions")
+
+
+async def evict_revoked_sessions(db):
+    """Drop sessions revoked by other workers from the local cache."""
+    # Anything revoked before this window has already expired from the cache
+    since = datetime.utcnow() - timedelta(seconds=2 * SESSION_CACHE_TTL)
+    cursor = db.session_revocations.find(
+        {"revoked": {"$gte": since}}, {"_id": 0, "session_id": 1}
+    )
+    async for revocation in cursor:
+        session_cache.pop(revocation["session_id"])
+
+
+versions.subscribe("sessions", evict_revoked_sessions)
+
+
 # Authentication dependencies
 async def get_current_user(session: Optional[str] = Cookie(None)) -> Tuple[str, str]:
     """Get current authenticated user from session cookie."""
@@ -0,0 +1,20 @@
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .database import DATABASE_NAME, MONGODB_URL
+from .teams import rebuild_team_totals
+
+
+async def main():
+    """Backfill or repair the denormalized team fields of all users."""
+    client = AsyncIOMotorClient(MONGODB_URL)
+    try:
+        updated = await rebuild_team_totals(client[DATABASE_NAME])
+        print(f"Rebuilt team totals for {updated} users")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
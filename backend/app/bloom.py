@@ -0,0 +1,62 @@
+import hashlib
+import math
+from typing import Any, Dict
+
+
+class BloomFilter:
+    """Compact set answering "definitely absent" or "possibly present".
+
+    Sized for an expected number of items and a target false-positive rate:
+    m = -n ln(p) / ln(2)^2 bits and k = m/n ln(2) hash functions. Bit
+    positions come from double hashing one 128-bit BLAKE2b digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        """Add an item; re-adding one (or a lookalike) does not count it again."""
+        bits = self._bits
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Report size, item count and the expected false-positive rate."""
+        return {
+            "bytes": len(self._bits),
+            "hashes": self.hashes,
+            "capacity": self.capacity,
+            "count": self.count,
+            "expected_error_rate": (1 - math.exp(-self.hashes * self.count / self.size))
+            ** self.hashes,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReadPreference
+
+from . import versions
+
+
+class PlayerCatalog:
+    """In-memory copy of the players collection, indexed by player id.
+
+    A reload builds a fresh snapshot and swaps it in with a single assignment,
+    so readers never observe a half-built catalog. Player documents are shared
+    between requests and must be treated as read-only.
+
+    Structures computed from the players (rankings, indexes and the like) are
+    memoized with derive() and dropped on every reload.
+
+    The snapshot remembers the "players" data version it was loaded at, so
+    responses built from it carry that version rather than whatever this
+    worker has heard of since.
+    """
+
+    def __init__(self):
+        self._players: Dict[int, Dict[str, Any]] = {}
+        self._derived: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        self.version = 0
+        self.updated: Optional[datetime] = None
+
+    async def load(self, db):
+        """Reload every player from the database."""
+        async with self._lock:
+            # Reloads follow a version bump, and this worker will not reload
+            # again for that version, so they read from the primary: a
+            # lagging secondary would pin the old catalog until the next write.
+            # The version is read first, so the players read after it are at
+            # least that new and the snapshot is never labelled newer than it is.
+            versions_collection = db.get_collection(
+                "data_versions", read_preference=ReadPreference.PRIMARY
+            )
+            version = await versions_collection.find_one({"_id": "players"}) or {}
+            players = {}
+            players_collection = db.get_collection(
+                "players", read_preference=ReadPreference.PRIMARY
+            )
+            async for doc in players_collection.find({}, {"_id": 0}).sort("id", 1):
+                players[doc["id"]] = doc
+            self._players = players
+            self._derived = {}
+            self.version = version.get("version", 0)
+            self.updated = version.get("updated")
+
+    def get(self, player_id: int) -> Optional[Dict[str, Any]]:
+        """Get a player document by id."""
+        return self._players.get(player_id)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Get all player documents ordered by id."""
+        return list(self._players.values())
+
+    def derive(self, key: str, build: Callable[[List[Dict[str, Any]]], Any]) -> Any:
+        """Get a value built from all players, building it once per reload."""
+        if key not in self._derived:
+            self._derived[key] = build(self.all())
+        return self._derived[key]
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+
+player_catalog = PlayerCatalog()
+
+versions.subscribe("players", player_catalog.load)
+
+
+async def players_changed(db):
+    """Publish a write to the players collection and reload the catalog."""
+    await versions.bump(db, "players")
+    await player_catalog.load(db)
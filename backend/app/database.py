@@ -1,6 +1,22 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import FastAPI
+import asyncio
+import logging
 import os
+from typing import Optional
+
+from . import versions
+from .catalog import player_catalog
+from .db_config import (
+    MONGODB_WARMUP_CONNECTIONS,
+    MONGODB_WARMUP_RETRY_MAX_SECONDS,
+    MONGODB_WARMUP_RETRY_SECONDS,
+    client_options,
+    read_options,
+)
+from .players import seed_player_id_counter, warm_player_views
+from .suggestions import SuggestionIndex
+from .usernames import username_index
 
 # Database configuration
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
@@ -9,22 +25,76 @@ DATABASE_NAME = "cricket_fantasy"
 client = None
 db = None
 
+# Set once connections are open and caches are primed; /health reports
+# ready from then on
+ready = asyncio.Event()
+_warm_up_task: Optional[asyncio.Task] = None
+
+logger = logging.getLogger(__name__)
+
 
 async def connect_to_mongodb():
     """Connect to MongoDB."""
-    global client, db
-    client = AsyncIOMotorClient(MONGODB_URL)
+    global client, db, _warm_up_task
+    ready.clear()
+    client = AsyncIOMotorClient(MONGODB_URL, **client_options())
     db = client[DATABASE_NAME]
 
     # Create indexes
     await db.users.create_index("username", unique=True)
     await db.sessions.create_index("session_id", unique=True)
+    await db.sessions.create_index("expiry", expireAfterSeconds=0)
+    await db.session_revocations.create_index("revoked", expireAfterSeconds=3600)
+    await db.token_revocations.create_index("expiry", expireAfterSeconds=0)
+    await db.rate_limits.create_index("updated", expireAfterSeconds=3600)
     await db.players.create_index("id", unique=True)
+    await db.users.create_index(
+        [("points", -1), ("username", 1)],
+        partialFilterExpression={"team.11": {"$exists": True}},
+    )
+    await db.users.create_index("team_ids")
+    await seed_player_id_counter(db)
+
+    # Load in-process caches and follow writes made by other workers
+    await versions.poll(db, notify=False)
+    await player_catalog.load(db)
+    await username_index.load(db)
+    versions.start(db)
+
+    _warm_up_task = asyncio.create_task(warm_up())
+
+
+async def warm_up():
+    """
+    Open pooled connections and build the hot derived caches.
+
+    Failed attempts are retried with backoff; /health keeps reporting not
+    ready until one succeeds.
+    """
+    delay = MONGODB_WARMUP_RETRY_SECONDS
+    while True:
+        try:
+            # Concurrent round trips make the driver open that many connections
+            await asyncio.gather(
+                *(db.command("ping") for _ in range(MONGODB_WARMUP_CONNECTIONS))
+            )
+            player_catalog.derive("suggestion_index", SuggestionIndex)
+            warm_player_views()
+        except Exception:
+            logger.exception("Database warm-up failed, retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MONGODB_WARMUP_RETRY_MAX_SECONDS)
+        else:
+            ready.set()
+            return
 
 
 async def close_mongodb_connection():
     """Close MongoDB connection."""
     global client
+    if _warm_up_task is not None:
+        _warm_up_task.cancel()
+    await versions.stop()
     if client:
         client.close()
 
@@ -34,6 +104,11 @@ def get_db():
     return db
 
 
+def get_collection(name: str, purpose: Optional[str] = None):
+    """Get a collection with the read preference and concern configured for it."""
+    return db.get_collection(name, **read_options(name, purpose))
+
+
 def init_app(app: FastAPI):
     """Initialize database connection on app startup."""
     app.add_event_handler("startup", connect_to_mongodb)
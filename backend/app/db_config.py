@@ -0,0 +1,103 @@
+import os
+from typing import Any, Dict, Optional
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+# Connection pool and timeouts
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+
+# Connections opened at startup, before the app reports ready
+MONGODB_WARMUP_CONNECTIONS = int(
+    os.getenv("MONGODB_WARMUP_CONNECTIONS", str(MONGODB_MIN_POOL_SIZE))
+)
+# Seconds between warm-up attempts, doubling up to the maximum
+MONGODB_WARMUP_RETRY_SECONDS = float(os.getenv("MONGODB_WARMUP_RETRY_SECONDS", "1"))
+MONGODB_WARMUP_RETRY_MAX_SECONDS = float(
+    os.getenv("MONGODB_WARMUP_RETRY_MAX_SECONDS", "30")
+)
+
+# Secondaries may serve data older than this (-1 leaves it to the driver)
+MONGODB_MAX_STALENESS_SECONDS = int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "-1"))
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _targets(name: str) -> Dict[str, str]:
+    # Parse "target=value,target=value"
+    pairs = (pair.split("=", 1) for pair in os.getenv(name, "").split(",") if pair)
+    return {target.strip(): value.strip() for target, value in pairs}
+
+
+# Read preference and read concern level per read target. A target is a
+# collection name, or the purpose a read is made for ("leaderboard" reads
+# users), which takes precedence. The player catalog is not routable: its
+# reloads always read the primary. Everything reads from the primary unless
+# configured otherwise: routing a target to secondaries trades
+# read-your-writes for load, e.g.
+#   MONGODB_READ_PREFERENCES=leaderboard=secondaryPreferred
+#   MONGODB_READ_CONCERNS=leaderboard=local
+READ_PREFERENCES = _targets("MONGODB_READ_PREFERENCES")
+READ_CONCERNS = _targets("MONGODB_READ_CONCERNS")
+
+for _target, _mode in READ_PREFERENCES.items():
+    if _mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference {_mode!r} for {_target}")
+
+
+def client_options() -> Dict[str, Any]:
+    """Get the AsyncIOMotorClient pool and timeout options."""
+    return {
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGODB_SOCKET_TIMEOUT_MS,
+    }
+
+
+def read_options(collection: str, purpose: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the get_collection() read options configured for a read.
+
+    Args:
+        collection: Collection being read
+        purpose: What the read is for, if it has its own settings
+
+    Returns:
+        Dict with read_preference and/or read_concern, empty for defaults
+    """
+    options = {}
+    for target in (collection, purpose):
+        mode = READ_PREFERENCES.get(target)
+        if mode is not None:
+            preference = READ_PREFERENCE_MODES[mode]
+            options["read_preference"] = (
+                preference()
+                if mode == "primary"
+                else preference(max_staleness=MONGODB_MAX_STALENESS_SECONDS)
+            )
+        level = READ_CONCERNS.get(target)
+        if level is not None:
+            options["read_concern"] = ReadConcern(level)
+    return options
@@ -0,0 +1,102 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from . import versions
+from .catalog import player_catalog
+
+# Datasets each cacheable response is built from, and their Cache-Control
+# max-age hints in seconds
+CATALOG = ("players",)
+CATALOG_MAX_AGE = 30
+LEADERBOARD = ("players", "teams")
+LEADERBOARD_MAX_AGE = 5
+
+
+def _stamp(name: str) -> Tuple[int, Optional[datetime]]:
+    # Player responses are built from the catalog, so they carry the version
+    # it was loaded at; other datasets are read live, after their writers
+    # have bumped them
+    if name == "players":
+        return player_catalog.version, player_catalog.updated
+    return versions.current(name), versions.last_modified(name)
+
+
+def etag_for(datasets: Sequence[str], *extra) -> str:
+    """
+    Build a weak ETag from the versions of the datasets a response is built from.
+
+    Args:
+        datasets: Names of the versioned datasets behind the response
+        extra: Anything else the response varies on (query, caller, ...)
+
+    Returns:
+        Quoted weak ETag
+    """
+    stamp = ":".join(f"{name}={_stamp(name)[0]}" for name in datasets)
+    digest = hashlib.sha1(f"{stamp}|{extra!r}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def last_modified_for(datasets: Sequence[str]) -> Optional[datetime]:
+    """Get the latest change time across datasets, as an aware UTC datetime."""
+    times = [_stamp(name)[1] for name in datasets]
+    times = [t for t in times if t is not None]
+    if not times:
+        return None
+    return max(times).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _headers(etag: str, datasets: Sequence[str], max_age: int) -> dict:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}, must-revalidate",
+    }
+    modified = last_modified_for(datasets)
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    return headers
+
+
+def not_modified(
+    request: Request, etag: str, datasets: Sequence[str], max_age: int = 0
+) -> Optional[Response]:
+    """
+    Answer a conditional GET with 304 when the client's copy is current.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    the request carries no If-None-Match.
+
+    Returns:
+        A 304 response, or None if the full response has to be sent
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        # Weak comparison: W/"x" and "x" name the same representation
+        if "*" in tags or etag in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers=_headers(etag, datasets, max_age))
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = last_modified_for(datasets)
+    if if_modified_since and modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is not None and modified <= since:
+            return Response(status_code=304, headers=_headers(etag, datasets, max_age))
+
+    return None
+
+
+def add_cache_headers(
+    response: Response, etag: str, datasets: Sequence[str], max_age: int = 0
+) -> Response:
+    """Stamp a response with its ETag, Last-Modified and Cache-Control hints."""
+    response.headers.update(_headers(etag, datasets, max_age))
+    return response
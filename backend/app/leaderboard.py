@@ -0,0 +1,52 @@
+from typing import Any, Dict, Optional
+
+from .database import get_collection
+
+# Teams are keyed by consecutive positions "1".."11", so a team is complete
+# exactly when position 11 is filled.
+COMPLETE_TEAM = {"team.11": {"$exists": True}}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+async def get_leaderboard_page(
+    user_id: str, skip: int = 0, limit: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """Read one page of the leaderboard plus the caller's own rank."""
+    users_collection = get_collection("users", "leaderboard")
+
+    users = []
+    cursor = (
+        users_collection.find(COMPLETE_TEAM, {"_id": 0, "username": 1, "points": 1})
+        .sort([("points", -1), ("username", 1)])
+        .skip(skip)
+        .limit(limit)
+    )
+    async for user in cursor:
+        users.append({"username": user["username"], "points": user.get("points", 0)})
+
+    total = await users_collection.count_documents(COMPLETE_TEAM)
+
+    # The caller only has a rank once their own team is complete
+    rank: Optional[int] = None
+    points: Optional[int] = None
+    me = await users_collection.find_one(
+        {"_id": user_id, **COMPLETE_TEAM}, {"_id": 0, "points": 1}
+    )
+    if me:
+        points = me.get("points", 0)
+        rank = (
+            await users_collection.count_documents(
+                {**COMPLETE_TEAM, "points": {"$gt": points}}
+            )
+            + 1
+        )
+
+    return {
+        "success": True,
+        "users": users,
+        "total": total,
+        "rank": rank,
+        "points": points,
+    }
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .metrics import LatencyRecorder
+
+# Calls sent upstream at once, and calls allowed to wait for a free slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+# Deadline for a call, from asking for a slot to having the answer
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMUnavailable(Exception):
+    """The LLM cannot answer right now; callers should use a local fallback."""
+
+
+class LLMGateway:
+    """Admission control in front of the LLM upstream.
+
+    At most max_concurrency calls run at once and at most max_queue more
+    wait for a slot; beyond that calls are rejected immediately. Every call
+    has a deadline. After failure_threshold consecutive failures or
+    timeouts the circuit opens and calls are rejected without touching the
+    upstream; once reset_seconds have passed a single trial call is let
+    through, and its outcome closes or reopens the circuit.
+
+    Rejections raise LLMUnavailable.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        timeout: float = LLM_TIMEOUT,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        reset_seconds: float = LLM_BREAKER_RESET,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.latency = LatencyRecorder()
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """Circuit state: "closed", "open" or "half_open"."""
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise LLMUnavailable(reason)
+
+    def _admit(self) -> bool:
+        # Returns whether the call is the half-open trial
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial):
+            self._reject("circuit open")
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self._reject("queue full")
+        if state == "half_open":
+            self._trial = True
+            return True
+        return False
+
+    def _record_success(self):
+        self._consecutive_failures = 0
+        self._opened_at = None
+
+    def _record_failure(self, trial: bool):
+        self.failures += 1
+        self._consecutive_failures += 1
+        if trial or self._consecutive_failures >= self.failure_threshold:
+            if self._opened_at is None or trial:
+                logger.warning("LLM circuit opened after repeated failures")
+            self._opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def slot(self, wait: Optional[float] = None):
+        """
+        Hold a concurrency slot for the duration of an upstream call.
+
+        An exception leaving the block counts as a failed call; a cancelled
+        call (the client went away) counts as neither success nor failure.
+
+        Args:
+            wait: Seconds to wait for a free slot (defaults to the timeout)
+
+        Raises:
+            LLMUnavailable: If the circuit is open, the queue is full, or
+                no slot frees up in time
+        """
+        trial = self._admit()
+        try:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._semaphore.acquire(),
+                    self.timeout if wait is None else wait,
+                )
+            except TimeoutError:
+                self._reject("no free slot")
+            finally:
+                self.waiting -= 1
+
+            self.calls += 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                yield
+            except TimeoutError:
+                self.timeouts += 1
+                self._record_failure(trial)
+                raise
+            except Exception:
+                self._record_failure(trial)
+                raise
+            else:
+                self._record_success()
+            finally:
+                self.latency.record(time.perf_counter() - started)
+                self.in_flight -= 1
+                self._semaphore.release()
+        finally:
+            if trial:
+                self._trial = False
+
+    async def call(
+        self, fn: Callable[[], Awaitable[T]], timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run an upstream call under the concurrency cap, deadline and breaker.
+
+        Args:
+            fn: Coroutine function making the call
+            timeout: Deadline in seconds (defaults to the gateway's)
+
+        Returns:
+            What fn returned
+
+        Raises:
+            LLMUnavailable: If the call was rejected or missed its deadline
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            async with self.slot(wait=timeout):
+                # Time spent waiting for the slot counts against the deadline
+                async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+                    return await fn()
+        except TimeoutError:
+            raise LLMUnavailable("deadline exceeded") from None
+
+    def stats(self) -> Dict[str, Any]:
+        """Report load, outcome counters, circuit state and call latency."""
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "circuit": self.state,
+            "latency": self.latency.stats(),
+        }
+
+
+llm_gateway = LLMGateway()
@@ -1,8 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from .auth import load_revoked_tokens
+from . import database
 from .database import init_app
-from .routers import auth, admin, user, chatbot
+from .ratelimit import RateLimitMiddleware
+from .realtime import leaderboard_hub
+from .routers import auth, admin, user, chatbot, realtime
+from .teams import backfill_team_fields
 
 # Create FastAPI app
 app = FastAPI(
@@ -11,6 +17,9 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Throttle the auth routes; added before CORS so 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # Set up CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,11 +32,23 @@ app.add_middleware(
 # Initialize database connection
 init_app(app)
 
+# Backfill the team fields of users written before they existed, so team
+# mutations never start from a missing team; startup handlers all finish
+# before any request is served
+app.add_event_handler("startup", backfill_team_fields)
+
+# Load signed session revocations and push leaderboard changes to streaming
+# clients once the database is up
+app.add_event_handler("startup", load_revoked_tokens)
+app.add_event_handler("startup", leaderboard_hub.start)
+app.add_event_handler("shutdown", leaderboard_hub.stop)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(admin.router, prefix="/admin")
 app.include_router(user.router, prefix="/user")
 app.include_router(chatbot.router, prefix="/user")
+app.include_router(realtime.router, prefix="/user")
 
 
 # Root endpoint
@@ -40,7 +61,9 @@ async def root():
     }
 
 
-# Health check endpoint
+# Health check endpoint; not ready until the database warm-up has finished
 @app.get("/health")
 async def health():
+    if not database.ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting"})
     return {"status": "healthy"}
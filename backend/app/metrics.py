@@ -0,0 +1,42 @@
+from collections import deque
+from typing import Any, Dict
+
+# Samples kept for percentiles
+WINDOW = 1024
+
+
+class LatencyRecorder:
+    """Running count and mean of a latency, with percentiles of recent samples.
+
+    Samples are seconds; stats() reports milliseconds.
+    """
+
+    def __init__(self, window: int = WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        """Add a sample."""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the sample count and mean/p50/p95/max in milliseconds."""
+        recent = sorted(self._recent)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": self.max * 1000,
+        }
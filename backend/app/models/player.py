@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
 
 
 class PlayerBase(BaseModel):
@@ -48,6 +48,23 @@ class PlayerArrayResponse(BaseModel):
     player_array: List[PlayerBase]
 
 
+class PlayerQuery(BaseModel):
+    category: Optional[str] = None
+    university: Optional[str] = None
+    min_budget: Optional[int] = None
+    max_budget: Optional[int] = None
+    sort: Literal["id", "value", "budget"] = "id"
+    cursor: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1, le=500)
+    fields: Optional[str] = None
+
+
+class PlayerPageResponse(BaseModel):
+    success: bool
+    player_array: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class PlayerResponse(BaseModel):
     success: bool
     player: PlayerDetail
@@ -57,5 +74,7 @@ class TournamentSummary(BaseModel):
     success: bool
     total_runs: int
     total_wickets: int
-    highest_runs: PlayerDetail
-    highest_wickets: PlayerDetail
+    highest_runs: Optional[PlayerDetail] = None
+    highest_wickets: Optional[PlayerDetail] = None
+    top_run_scorers: List[PlayerDetail] = []
+    top_wicket_takers: List[PlayerDetail] = []
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Optional, List
 
 from .player import PlayerDetail
@@ -15,6 +15,23 @@ class TeamPlayerRequest(BaseModel):
     playerId: int
 
 
+class CategoryQuota(BaseModel):
+    min: int = Field(0, ge=0, le=11)
+    max: int = Field(11, ge=0, le=11)
+
+
+class TeamOptimizeRequest(BaseModel):
+    quotas: Dict[str, CategoryQuota] = {}
+
+
+class TeamOptimizeResponse(BaseModel):
+    success: bool
+    optimal: bool
+    players: List[PlayerDetail]
+    budget_used: int
+    remaining: int
+
+
 class BudgetResponse(BaseModel):
     success: bool
     total: int
@@ -30,6 +47,9 @@ class LeaderboardUser(BaseModel):
 class LeaderboardResponse(BaseModel):
     success: bool
     users: List[LeaderboardUser]
+    total: int = 0
+    rank: Optional[int] = None
+    points: Optional[int] = None
 
 
 class ChatbotRequest(BaseModel):
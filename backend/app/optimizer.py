@@ -0,0 +1,221 @@
+import heapq
+import os
+import time
+from itertools import accumulate, islice
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .suggestions import SuggestionIndex
+
+# Seconds the exact search may run before falling back to a greedy pick
+OPTIMIZE_TIME_BUDGET = float(os.getenv("OPTIMIZE_TIME_BUDGET_SECONDS", "0.5"))
+
+Player = Dict[str, Any]
+# (min, max) players of a category in the complete team
+Quota = Tuple[int, int]
+# (count, budget) -> (value, back-pointer path)
+States = Dict[Tuple[int, int], Tuple[int, tuple]]
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _check(deadline: float):
+    if time.monotonic() > deadline:
+        raise _OutOfTime
+
+
+def _rank(player: Player):
+    return -player["value"], player["id"]
+
+
+def _pareto(states: States) -> States:
+    # For each count keep only the states where spending more buys more value
+    kept = {}
+    best: Dict[int, int] = {}
+    for (count, spent), entry in sorted(states.items()):
+        if entry[0] > best.get(count, -1):
+            best[count] = entry[0]
+            kept[(count, spent)] = entry
+    return kept
+
+
+def _candidate_tiers(
+    index: SuggestionIndex, category: str, locked_ids: set, slots: int
+) -> List[Tuple[int, List[Player]]]:
+    # Players of one tier cost the same, so a team never takes a player over
+    # a better one of the same tier: only the top `slots` of a tier matter.
+    pruned = []
+    for budget, players in index.tiers(category):
+        best = list(islice((p for p in players if p["id"] not in locked_ids), slots))
+        if best:
+            pruned.append((budget, best))
+    return pruned
+
+
+def _category_options(
+    tiers: List[Tuple[int, List[Player]]],
+    max_count: int,
+    max_budget: int,
+    deadline: float,
+) -> States:
+    """Best value for every (count, budget) that one category can supply."""
+    states: States = {(0, 0): (0, ())}
+    for tier, (budget, players) in enumerate(tiers):
+        gains = list(accumulate(p["value"] for p in players))
+        extended = dict(states)
+        for (count, spent), (value, path) in states.items():
+            for taken, gain in enumerate(gains, 1):
+                key = (count + taken, spent + taken * budget)
+                if key[0] > max_count or key[1] > max_budget:
+                    break
+                if key not in extended or extended[key][0] < value + gain:
+                    extended[key] = (value + gain, path + ((tier, taken),))
+        states = extended
+        _check(deadline)
+    return _pareto(states)
+
+
+def _exact(
+    tiers_by_category: Dict[str, List[Tuple[int, List[Player]]]],
+    bounds: Dict[str, Quota],
+    slots: int,
+    budget: int,
+    deadline: float,
+) -> Optional[List[Player]]:
+    states: States = {(0, 0): (0, ())}
+    for category, tiers in tiers_by_category.items():
+        low, high = bounds[category]
+        options = [
+            (count, spent, value, path)
+            for (count, spent), (value, path) in _category_options(
+                tiers, min(high, slots), budget, deadline
+            ).items()
+            if count >= low
+        ]
+
+        combined: States = {}
+        for (count, spent), (value, choice) in states.items():
+            for add_count, add_spent, add_value, path in options:
+                key = (count + add_count, spent + add_spent)
+                if key[0] > slots or key[1] > budget:
+                    continue
+                if key not in combined or combined[key][0] < value + add_value:
+                    combined[key] = (value + add_value, choice + ((category, path),))
+            _check(deadline)
+        states = _pareto(combined)
+
+    complete = [entry for (count, _), entry in states.items() if count == slots]
+    if not complete:
+        return None
+
+    _, choice = max(complete, key=lambda entry: entry[0])
+    picks = []
+    for category, path in choice:
+        for tier, taken in path:
+            picks.extend(tiers_by_category[category][tier][1][:taken])
+    return picks
+
+
+def _greedy(
+    tiers_by_category: Dict[str, List[Tuple[int, List[Player]]]],
+    bounds: Dict[str, Quota],
+    slots: int,
+    budget: int,
+    min_budget: int,
+) -> Optional[List[Player]]:
+    streams = [players for tiers in tiers_by_category.values() for _, players in tiers]
+    picks: List[Player] = []
+    counts = {category: 0 for category in bounds}
+    spent = 0
+
+    for player in heapq.merge(*streams, key=_rank):
+        if len(picks) == slots:
+            break
+        category = player["category"]
+        low, high = bounds[category]
+        if counts[category] >= high:
+            continue
+
+        # Leave enough slots for unmet quotas and enough budget for the rest
+        left = slots - len(picks) - 1
+        unmet = sum(max(0, bounds[c][0] - n) for c, n in counts.items())
+        if counts[category] < low:
+            unmet -= 1
+        if unmet > left or spent + player["budget"] + left * min_budget > budget:
+            continue
+
+        picks.append(player)
+        counts[category] += 1
+        spent += player["budget"]
+
+    return picks if len(picks) == slots else None
+
+
+def optimize_team(
+    index: SuggestionIndex,
+    locked: Sequence[Player],
+    budget: int,
+    slots: int,
+    quotas: Optional[Mapping[str, Quota]] = None,
+    time_budget: float = OPTIMIZE_TIME_BUDGET,
+) -> Tuple[List[Player], bool]:
+    """
+    Pick the players that fill a team's empty slots for the most value.
+
+    Players of a category are grouped by budget tier, and a dynamic program
+    over (players picked, budget spent) chooses how many of each tier's best
+    players to take, first within each category and then across categories,
+    so quotas are enforced on per-category counts. Only states where extra
+    spending buys extra value are kept. If the search overruns its time
+    budget, the players are picked greedily by value instead.
+
+    Args:
+        index: Suggestion index of the catalog
+        locked: Players already in the team; they count towards quotas
+        budget: Budget left for the empty slots
+        slots: Number of empty slots to fill
+        quotas: (min, max) players per category in the complete team
+        time_budget: Seconds the exact search may take
+
+    Returns:
+        Tuple of (players to add, whether the pick is provably optimal)
+
+    Raises:
+        ValueError: If no selection satisfies the budget and quotas, or
+            the greedy fallback could not find one
+    """
+    quotas = quotas or {}
+    locked_ids = {player["id"] for player in locked}
+    locked_counts: Dict[str, int] = {}
+    for player in locked:
+        locked_counts[player["category"]] = locked_counts.get(player["category"], 0) + 1
+
+    categories = list(dict.fromkeys([*index.categories(), *quotas]))
+    bounds: Dict[str, Quota] = {}
+    for category in categories:
+        low, high = quotas.get(category, (0, slots + locked_counts.get(category, 0)))
+        taken = locked_counts.get(category, 0)
+        if low > high or taken > high:
+            raise ValueError(f"The quota for {category} cannot be met")
+        bounds[category] = (max(0, low - taken), high - taken)
+
+    tiers_by_category = {
+        category: _candidate_tiers(index, category, locked_ids, slots)
+        for category in categories
+    }
+
+    deadline = time.monotonic() + time_budget
+    try:
+        picks = _exact(tiers_by_category, bounds, slots, budget, deadline)
+        optimal = True
+    except _OutOfTime:
+        picks = _greedy(tiers_by_category, bounds, slots, budget, index.min_budget)
+        optimal = False
+
+    if picks is None and optimal:
+        raise ValueError("No team fits the remaining budget and quotas")
+    if picks is None:
+        raise ValueError("No team was found within the time budget")
+
+    return sorted(picks, key=_rank), optimal
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import Optional
+
+# scrypt cost parameters for new hashes; raising them makes stored hashes
+# with lower parameters get rehashed on the next successful login
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2**14)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+
+# Hashing runs on a small thread pool (hashlib releases the GIL while it
+# works), so a burst of logins queues there instead of stalling the loop
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32
+    )
+
+
+def hash_password_sync(password: str) -> str:
+    """Hash a password for safe storage, as scrypt$n$r$p$salt$hash."""
+    salt = secrets.token_bytes(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def verify_password_sync(stored_password: str, provided_password: str) -> bool:
+    """Verify a password against a scrypt hash or a legacy salt:sha256 hash."""
+    if stored_password.startswith("scrypt$"):
+        _, n, r, p, salt, stored_hash = stored_password.split("$")
+        digest = _scrypt(provided_password, bytes.fromhex(salt), int(n), int(r), int(p))
+        return secrets.compare_digest(digest.hex(), stored_hash)
+
+    salt, stored_hash = stored_password.split(":", 1)
+    hash_obj = hashlib.sha256(f"{provided_password}{salt}".encode())
+    return secrets.compare_digest(hash_obj.hexdigest(), stored_hash)
+
+
+@cache
+def _dummy_hash() -> str:
+    # Stands in for the stored hash of a user that does not exist
+    return hash_password_sync(secrets.token_hex(16))
+
+
+def _verify_sync(stored_password: Optional[str], provided_password: str) -> bool:
+    if stored_password is None:
+        verify_password_sync(_dummy_hash(), provided_password)
+        return False
+    return verify_password_sync(stored_password, provided_password)
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """Check whether a stored hash is legacy or uses outdated parameters."""
+    prefix = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$"
+    return not stored_password.startswith(prefix)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password_sync, password)
+
+
+async def verify_password(
+    stored_password: Optional[str], provided_password: str
+) -> bool:
+    """
+    Verify a password on the hashing pool.
+
+    With no stored hash (the user does not exist) the password is checked
+    against a dummy scrypt hash and rejected, so a login takes as long
+    whether or not the username is registered.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, _verify_sync, stored_password, provided_password
+    )
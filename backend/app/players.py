@@ -0,0 +1,312 @@
+import base64
+import bisect
+import csv
+import json
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    get_args,
+)
+
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .catalog import player_catalog
+from .models.player import PlayerBase, PlayerCreate, PlayerQuery
+from .stats import DERIVED_FIELDS, derive_stats
+
+IMPORT_BATCH_SIZE = 500
+
+PLAYER_ID_COUNTER = "player_id"
+
+PLAYER_BASE_FIELDS = tuple(PlayerBase.model_fields)
+
+
+async def seed_player_id_counter(db):
+    """Make sure the player id counter is ahead of every existing player id."""
+    last_player = await db.players.find_one(sort=[("id", -1)], projection={"id": 1})
+    await db.counters.update_one(
+        {"_id": PLAYER_ID_COUNTER},
+        {"$max": {"seq": last_player["id"] if last_player else 0}},
+        upsert=True,
+    )
+
+
+async def allocate_player_ids(db, count: int) -> List[int]:
+    """Atomically reserve a block of consecutive player ids."""
+    counter = await db.counters.find_one_and_update(
+        {"_id": PLAYER_ID_COUNTER},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last_id = counter["seq"]
+    return list(range(last_id - count + 1, last_id + 1))
+
+
+def build_player_documents(
+    players: List[PlayerCreate], ids: List[int]
+) -> List[Dict[str, Any]]:
+    """Build player documents, with derived stats, for a batch of new players."""
+    stats = derive_stats([p.runs for p in players], [p.wickets for p in players])
+
+    return [
+        {
+            "id": ids[i],
+            "name": player.name,
+            "university": player.university,
+            "category": player.role,
+            "budget": stats["budget"][i],
+            "value": stats["value"][i],
+            "runs": player.runs,
+            "wickets": player.wickets,
+            "bat_strike_rate": stats["bat_strike_rate"][i],
+            "bow_strike_rate": stats["bow_strike_rate"][i],
+            "bat_avg": stats["bat_avg"][i],
+            "econ": stats["econ"][i],
+        }
+        for i, player in enumerate(players)
+    ]
+
+
+async def recalculate_players(db) -> int:
+    """
+    Recompute the derived stats of every player in one bulk write.
+
+    Args:
+        db: Database holding the players
+
+    Returns:
+        Number of players rewritten
+    """
+    ids = []
+    runs = []
+    wickets = []
+    async for player_doc in db.players.find(
+        {}, {"_id": 0, "id": 1, "runs": 1, "wickets": 1}
+    ):
+        ids.append(player_doc["id"])
+        runs.append(player_doc.get("runs", 0))
+        wickets.append(player_doc.get("wickets", 0))
+
+    if not ids:
+        return 0
+
+    stats = derive_stats(runs, wickets)
+    await db.players.bulk_write(
+        [
+            UpdateOne(
+                {"id": player_id},
+                {"$set": {field: stats[field][i] for field in DERIVED_FIELDS}},
+            )
+            for i, player_id in enumerate(ids)
+        ],
+        ordered=False,
+    )
+    return len(ids)
+
+
+def _sort_key(sort: str) -> Callable[[Dict[str, Any]], Tuple]:
+    """Key ordering players by id, or best first by value or budget."""
+    if sort == "id":
+        return lambda p: (p["id"],)
+    return lambda p: (-p[sort], p["id"])
+
+
+def _sorted_players(sort: str) -> Tuple[List[Dict[str, Any]], List[Tuple]]:
+    """Catalog players in sort order, with their sort keys for bisecting."""
+
+    def build(players):
+        key = _sort_key(sort)
+        ordered = sorted(players, key=key)
+        return ordered, [key(p) for p in ordered]
+
+    return player_catalog.derive(f"players_by_{sort}", build)
+
+
+def warm_player_views():
+    """Build the sorted player views of every /players sort order."""
+    for sort in get_args(PlayerQuery.model_fields["sort"].annotation):
+        _sorted_players(sort)
+
+
+def _encode_cursor(key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple:
+    try:
+        key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(part, int) for part in key):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def query_players(query: PlayerQuery) -> Dict[str, Any]:
+    """
+    Filter, sort and page through the player catalog.
+
+    Pages are keyset based: the cursor holds the sort key of the last player
+    returned, and the next page starts right after it in the sorted view.
+
+    Args:
+        query: Filters, sort order, cursor, page size and field projection
+
+    Returns:
+        Dict with the projected players and the cursor of the next page
+
+    Raises:
+        ValueError: If the cursor or a requested field is invalid
+    """
+    fields = PLAYER_BASE_FIELDS
+    if query.fields:
+        fields = tuple(f.strip() for f in query.fields.split(",") if f.strip())
+        unknown = set(fields) - set(PLAYER_BASE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        if "id" not in fields:
+            fields = ("id",) + fields
+
+    ordered, keys = _sorted_players(query.sort)
+    start = 0
+    if query.cursor:
+        cursor_key = _decode_cursor(query.cursor)
+        if keys and len(cursor_key) != len(keys[0]):
+            raise ValueError("Invalid cursor")
+        start = bisect.bisect_right(keys, cursor_key)
+
+    category = query.category.lower() if query.category else None
+    university = query.university.lower() if query.university else None
+
+    page = []
+    last_key = None
+    next_cursor = None
+    for i in range(start, len(ordered)):
+        player = ordered[i]
+        if category and player["category"].lower() != category:
+            continue
+        if university and player["university"].lower() != university:
+            continue
+        if query.min_budget is not None and player["budget"] < query.min_budget:
+            continue
+        if query.max_budget is not None and player["budget"] > query.max_budget:
+            continue
+
+        # A further match means there is another page after this one
+        if query.limit is not None and len(page) == query.limit:
+            next_cursor = _encode_cursor(last_key)
+            break
+        page.append({field: player[field] for field in fields})
+        last_key = keys[i]
+
+    return {"success": True, "player_array": page, "next_cursor": next_cursor}
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def _rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Any]:
+    """Yield one parsed row (or the exception raised parsing it) per line."""
+    header: Optional[List[str]] = None
+    async for raw_line in _lines(chunks):
+        if not raw_line.strip():
+            continue
+        try:
+            # Decoded per row, so a bad byte only fails its own row
+            line = raw_line.decode("utf-8-sig").rstrip("\r")
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [column.strip() for column in values]
+                    continue
+                yield dict(zip(header, values))
+            else:
+                yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+async def import_players(db, chunks: AsyncIterator[bytes], fmt: str) -> Dict[str, Any]:
+    """
+    Stream players from CSV or NDJSON into the players collection.
+
+    Rows are validated against PlayerCreate and written in batches, each
+    with one id allocation and one unordered insert_many.
+
+    Args:
+        db: Database to import into
+        chunks: Request body as a stream of byte chunks
+        fmt: Either "csv" (with a header row) or "ndjson"
+
+    Returns:
+        Dict with the inserted and failed counts, per-row errors and throughput
+    """
+    started = time.perf_counter()
+    inserted = 0
+    errors = []
+    batch: List[PlayerCreate] = []
+    batch_rows: List[int] = []
+
+    async def flush():
+        nonlocal inserted
+        ids = await allocate_player_ids(db, len(batch))
+        documents = build_player_documents(batch, ids)
+        try:
+            result = await db.players.insert_many(documents, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details["nInserted"]
+            for write_error in e.details["writeErrors"]:
+                errors.append(
+                    {
+                        "row": batch_rows[write_error["index"]],
+                        "error": write_error["errmsg"],
+                    }
+                )
+        batch.clear()
+        batch_rows.clear()
+
+    row_number = 0
+    async for row in _rows(chunks, fmt):
+        row_number += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            batch.append(PlayerCreate(**row))
+            batch_rows.append(row_number)
+        except (ValidationError, ValueError, TypeError) as e:
+            errors.append({"row": row_number, "error": str(e)})
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "success": True,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(row_number / elapsed, 1) if elapsed else 0.0,
+    }
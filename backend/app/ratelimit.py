@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from .database import get_db
+from .serialization import dumps
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# "memory" keeps buckets per worker; "mongo" shares them between workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Buckets kept by the in-memory store before the least recently used go
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Only trust X-Forwarded-For when a proxy in front of the app sets it
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+
+# Largest request body accepted on routes with a per-username budget
+MAX_BODY_BYTES = 16 * 1024
+
+
+class Budget(NamedTuple):
+    """Token bucket refilling at rate tokens per second, up to burst."""
+
+    rate: float
+    burst: int
+
+
+class RouteLimits(NamedTuple):
+    per_ip: Budget
+    per_username: Optional[Budget] = None
+
+
+ROUTE_LIMITS: Dict[str, RouteLimits] = {
+    "/auth/login": RouteLimits(
+        per_ip=Budget(rate=10 / 60, burst=20),
+        per_username=Budget(rate=5 / 60, burst=5),
+    ),
+    "/auth/register": RouteLimits(per_ip=Budget(rate=5 / 60, burst=5)),
+    "/auth/validate-username": RouteLimits(per_ip=Budget(rate=5, burst=20)),
+}
+
+
+class MemoryBucketStore:
+    """Token buckets held in process, in a bounded LRU.
+
+    Lookups, refills and evictions are O(1). An evicted bucket comes back
+    full, which is the same as a client that has been idle long enough.
+    """
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def take(self, key: str, budget: Budget) -> Tuple[bool, float]:
+        """
+        Take a token from a bucket.
+
+        Returns:
+            Tuple of (whether a token was taken, seconds until one is free)
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+
+        return allowed, 0.0 if allowed else (1 - tokens) / budget.rate
+
+
+class MongoBucketStore:
+    """Token buckets shared by every worker through the rate_limits collection.
+
+    Each take is one atomic find_one_and_update whose pipeline refills the
+    bucket and takes a token. Idle buckets are removed by a TTL index.
+    """
+
+    async def take(self, key: str, budget: Budget) -> Tuple[bool, float]:
+        """
+        Take a token from a bucket.
+
+        Returns:
+            Tuple of (whether a token was taken, seconds until one is free)
+        """
+        db = get_db()
+        now = datetime.utcnow()
+        elapsed = {
+            "$divide": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, 1000]
+        }
+        refilled = {
+            "$min": [
+                budget.burst,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", budget.burst]},
+                        {"$multiply": [elapsed, budget.rate]},
+                    ]
+                },
+            ]
+        }
+        bucket = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {
+                    "$set": {
+                        "tokens": {
+                            "$cond": [
+                                "$allowed",
+                                {"$subtract": ["$tokens", 1]},
+                                "$tokens",
+                            ]
+                        }
+                    }
+                },
+            ],
+            projection={"_id": 0, "tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / budget.rate
+
+
+def _client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _username(body: bytes) -> Optional[str]:
+    try:
+        username = json.loads(body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    return username.lower() if isinstance(username, str) else None
+
+
+class BodyTooLarge(Exception):
+    """A throttled route's request body is over MAX_BODY_BYTES."""
+
+
+class RateLimitMiddleware:
+    """ASGI middleware throttling the routes in ROUTE_LIMITS.
+
+    Requests take a token from a bucket keyed by route and client IP and,
+    for routes with a per-username budget, one keyed by route and the
+    username in the JSON body. The body is read to find the username and
+    replayed to the application unchanged; bodies over MAX_BODY_BYTES get
+    a 413 instead. Throttled requests get a 429 with Retry-After.
+    """
+
+    def __init__(self, app, store=None, limits: Dict[str, RouteLimits] = None):
+        self.app = app
+        self.limits = ROUTE_LIMITS if limits is None else limits
+        if store is None:
+            store = (
+                MongoBucketStore()
+                if RATE_LIMIT_BACKEND == "mongo"
+                else MemoryBucketStore()
+            )
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        limits = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limits is None or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        allowed, retry_after = await self.store.take(
+            f"{path}|ip|{_client_ip(scope)}", limits.per_ip
+        )
+
+        if allowed and limits.per_username is not None:
+            try:
+                body, receive = await self._buffer_body(receive)
+            except BodyTooLarge:
+                # Padding the body must not dodge the per-username budget
+                await self._send_error(send, 413, "Request body too large")
+                return
+            username = _username(body) if body is not None else None
+            if username:
+                allowed, retry_after = await self.store.take(
+                    f"{path}|user|{username}", limits.per_username
+                )
+
+        if not allowed:
+            await self._send_error(
+                send,
+                429,
+                "Too many requests",
+                [(b"retry-after", str(max(1, math.ceil(retry_after))).encode())],
+            )
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _buffer_body(receive):
+        # Read the request body, and build a receive that replays it. The
+        # body is None if the client disconnected before sending all of it.
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return None, _replay([*chunks, message], receive)
+            chunks.append(message)
+            size += len(message.get("body", b""))
+            if size > MAX_BODY_BYTES:
+                raise BodyTooLarge()
+            more_body = message.get("more_body", False)
+
+        return b"".join(m.get("body", b"") for m in chunks), _replay(chunks, receive)
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str, headers=()):
+        body = dumps({"detail": detail})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _replay(messages, receive):
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import versions
+from .database import get_collection, get_db
+from .leaderboard import COMPLETE_TEAM
+from .serialization import dumps
+
+# Changes are coalesced and pushed at most once per tick
+TICK_SECONDS = float(os.getenv("REALTIME_TICK_SECONDS", "1"))
+TOP_N = int(os.getenv("REALTIME_TOP_N", "20"))
+
+# Events buffered per client before the oldest ones are dropped
+QUEUE_SIZE = 16
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Any]
+
+
+def format_event(name: str, data: Any) -> bytes:
+    """Encode an event in Server-Sent Events wire format."""
+    return b"event: " + name.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class LeaderboardHub:
+    """Fans leaderboard and team point changes out to streaming clients.
+
+    Once per tick the hub compares the "players" and "teams" data versions
+    with the ones it last broadcast. If either moved, however many admin
+    edits or team changes that covered, it reads the top of the leaderboard
+    and the subscribers' points once and queues only what changed. Writers
+    bump "teams" after their updates to users' points have landed, so that
+    read always sees them.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[asyncio.Queue, str] = {}
+        self._top: List[Dict[str, Any]] = []
+        self._points: Dict[str, Optional[int]] = {}
+        self._seen: Tuple[int, int] = (0, 0)
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Register a client and get the queue its events are delivered to."""
+        if user_id not in self._points:
+            db = get_db()
+            user = await db.users.find_one({"_id": user_id}, {"points": 1})
+            self._points[user_id] = user.get("points", 0) if user else None
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers[queue] = user_id
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Forget a disconnected client."""
+        user_id = self._subscribers.pop(queue, None)
+        if user_id not in self._subscribers.values():
+            self._points.pop(user_id, None)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: Event):
+        # A slow client loses its oldest events rather than stalling the hub
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    async def _read_top(self) -> List[Dict[str, Any]]:
+        cursor = (
+            get_collection("users", "leaderboard")
+            .find(COMPLETE_TEAM, {"_id": 0, "username": 1, "points": 1})
+            .sort([("points", -1), ("username", 1)])
+            .limit(TOP_N)
+        )
+        users = await cursor.to_list(length=TOP_N)
+        return [
+            {"rank": rank, "username": user["username"], "points": user["points"]}
+            for rank, user in enumerate(users, 1)
+        ]
+
+    async def broadcast(self):
+        """Push leaderboard deltas and team point changes to every client."""
+        db = get_db()
+
+        top = await self._read_top()
+        previous = {entry["username"]: entry for entry in self._top}
+        changed = [entry for entry in top if previous.get(entry["username"]) != entry]
+        current = {entry["username"] for entry in top}
+        removed = [username for username in previous if username not in current]
+        self._top = top
+
+        user_ids = list(set(self._subscribers.values()))
+        points = {}
+        if user_ids:
+            cursor = db.users.find({"_id": {"$in": user_ids}}, {"points": 1})
+            async for user in cursor:
+                points[user["_id"]] = user.get("points", 0)
+
+        team_events = {}
+        for user_id in user_ids:
+            new_points = points.get(user_id)
+            old_points = self._points.get(user_id)
+            if new_points != old_points:
+                team_events[user_id] = (
+                    "team",
+                    {
+                        "points": new_points,
+                        "change": (new_points or 0) - (old_points or 0),
+                    },
+                )
+            self._points[user_id] = new_points
+
+        for queue, user_id in list(self._subscribers.items()):
+            if changed or removed:
+                self._deliver(
+                    queue, ("leaderboard", {"changed": changed, "removed": removed})
+                )
+            if user_id in team_events:
+                self._deliver(queue, team_events[user_id])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK_SECONDS)
+            seen = (versions.current("players"), versions.current("teams"))
+            if seen == self._seen or not self._subscribers:
+                continue
+            try:
+                await self.broadcast()
+            except Exception:
+                logger.exception("Failed to broadcast leaderboard changes")
+                continue
+            self._seen = seen
+
+    async def start(self):
+        """Start the broadcast loop."""
+        if self._task is None:
+            self._seen = (versions.current("players"), versions.current("teams"))
+            self._top = await self._read_top()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the broadcast loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+leaderboard_hub = LeaderboardHub()
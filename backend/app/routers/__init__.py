@@ -1,3 +1,3 @@
-from . import auth, admin, user, chatbot
+from . import auth, admin, user, chatbot, realtime
 
-__all__ = ["auth", "admin", "user", "chatbot"]
+__all__ = ["auth", "admin", "user", "chatbot", "realtime"]
@@ -1,44 +1,68 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated
 
-from ..auth import get_admin_user
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+
+from ..auth import get_admin_user, session_cache
+from ..catalog import player_catalog, players_changed
 from ..database import get_db
+from ..http_cache import (
+    CATALOG,
+    CATALOG_MAX_AGE,
+    LEADERBOARD,
+    LEADERBOARD_MAX_AGE,
+    add_cache_headers,
+    etag_for,
+    not_modified,
+)
+from ..leaderboard import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_leaderboard_page
+from ..llm import llm_gateway
 from ..models.player import (
-    PlayerBase,
     PlayerDetail,
     PlayerCreate,
     PlayerUpdate,
     PlayerDelete,
     PlayerRequest,
-    PlayerArrayResponse,
+    PlayerPageResponse,
+    PlayerQuery,
     PlayerResponse,
     TournamentSummary,
 )
-from ..models.team import LeaderboardResponse, LeaderboardUser
+from ..models.team import LeaderboardResponse
+from ..players import (
+    allocate_player_ids,
+    import_players,
+    query_players,
+    recalculate_players,
+)
+from ..serialization import FastJSONResponse
+from ..stats import derive_player_stats
+from ..teams import rebuild_team_totals, refresh_player_teams
+from ..usernames import username_index
+from ..utils import response_cache, stream_first_token, stream_ttfb
 
 router = APIRouter(tags=["admin"])
 
 
-@router.get("/players", response_model=PlayerArrayResponse)
-async def get_players(user_data: tuple = Depends(get_admin_user)):
-    """Get all players (admin access)"""
+@router.get("/players", response_model=PlayerPageResponse)
+async def get_players(
+    request: Request,
+    query: Annotated[PlayerQuery, Query()],
+    user_data: tuple = Depends(get_admin_user),
+):
+    """Get players, optionally filtered, sorted and paginated (admin access)"""
     user_id, role = user_data
-    db = get_db()
 
-    players = []
-    cursor = db.players.find({})
-
-    async for doc in cursor:
-        player = PlayerBase(
-            id=doc["id"],
-            name=doc["name"],
-            university=doc["university"],
-            budget=doc["budget"],
-            category=doc["category"],
-            value=doc["value"],
-        )
-        players.append(player)
+    etag = etag_for(CATALOG, request.url.query)
+    cached = not_modified(request, etag, CATALOG, CATALOG_MAX_AGE)
+    if cached:
+        return cached
 
-    return {"success": True, "player_array": players}
+    try:
+        page = query_players(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return add_cache_headers(FastJSONResponse(page), etag, CATALOG, CATALOG_MAX_AGE)
 
 
 @router.post("/players", response_model=PlayerResponse)
@@ -47,9 +71,8 @@ async def get_player_detail(
 ):
     """Get player detail (admin access)"""
     user_id, role = user_data
-    db = get_db()
 
-    player_doc = await db.players.find_one({"id": player_req.id})
+    player_doc = player_catalog.get(player_req.id)
     if not player_doc:
         raise HTTPException(status_code=404, detail="Player not found")
 
@@ -78,56 +101,66 @@ async def create_player(
     db = get_db()
 
     # Generate player ID
-    last_player = await db.players.find_one(sort=[("id", -1)])
-    new_id = 1 if not last_player else last_player["id"] + 1
-
-    # Calculate player value based on runs and wickets
-    value = player.runs // 10 + player.wickets * 5
-
-    # Calculate stats
-    matches = max(1, (player.runs // 25) + (player.wickets // 2))  # Estimate matches
-    bat_strike_rate = 100 * (
-        player.runs / max(1, matches * 20)
-    )  # Estimated balls faced
-    bow_strike_rate = 6 * (
-        player.wickets / max(1, matches * 24)
-    )  # Estimated balls bowled
-    bat_avg = player.runs / max(1, matches)
-    econ = 6 * (player.runs / max(1, matches * 4))  # Estimated overs bowled
-
-    # Set budget based on value
-    if value > 100:
-        budget = 15
-    elif value > 75:
-        budget = 12
-    elif value > 50:
-        budget = 10
-    elif value > 25:
-        budget = 8
-    else:
-        budget = 5
+    (new_id,) = await allocate_player_ids(db, 1)
 
-    # Create new player
+    # Create new player with stats derived from runs and wickets
     new_player = {
         "id": new_id,
         "name": player.name,
         "university": player.university,
         "category": player.role,
-        "budget": budget,
-        "value": value,
         "runs": player.runs,
         "wickets": player.wickets,
-        "bat_strike_rate": bat_strike_rate,
-        "bow_strike_rate": bow_strike_rate,
-        "bat_avg": bat_avg,
-        "econ": econ,
+        **derive_player_stats(player.runs, player.wickets),
     }
 
     await db.players.insert_one(new_player)
+    await players_changed(db)
 
     return {"success": True}
 
 
+@router.post("/players/import")
+async def import_player_file(
+    request: Request, user_data: tuple = Depends(get_admin_user)
+):
+    """Bulk import players from CSV or NDJSON (admin access)"""
+    user_id, role = user_data
+    db = get_db()
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in ("text/csv", "application/csv"):
+        fmt = "csv"
+    elif content_type in ("application/x-ndjson", "application/ndjson"):
+        fmt = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Import expects text/csv or application/x-ndjson",
+        )
+
+    result = await import_players(db, request.stream(), fmt)
+    if result["inserted"]:
+        await players_changed(db)
+
+    return result
+
+
+@router.post("/players/recalculate")
+async def recalculate_all_players(user_data: tuple = Depends(get_admin_user)):
+    """Recalculate derived stats of every player (admin access)"""
+    user_id, role = user_data
+    db = get_db()
+
+    updated = await recalculate_players(db)
+    await players_changed(db)
+
+    # Budgets and values may have moved, so re-derive every team's totals
+    await rebuild_team_totals(db)
+
+    return {"success": True, "updated": updated}
+
+
 @router.patch("/players", response_model=PlayerResponse)
 async def update_player(
     player: PlayerUpdate, user_data: tuple = Depends(get_admin_user)
@@ -150,77 +183,27 @@ async def update_player(
     if player.role:
         update_data["category"] = player.role
 
-    # Update runs and recalculate stats if provided
-    if player.runs is not None:
-        update_data["runs"] = player.runs
-
-        # Recalculate stats
-        runs = player.runs
-        wickets = existing_player["wickets"]
-        if player.wickets is not None:
-            wickets = player.wickets
-            update_data["wickets"] = wickets
-
-        # Recalculate value
-        value = runs // 10 + wickets * 5
-        update_data["value"] = value
-
-        # Recalculate budget based on new value
-        if value > 100:
-            update_data["budget"] = 15
-        elif value > 75:
-            update_data["budget"] = 12
-        elif value > 50:
-            update_data["budget"] = 10
-        elif value > 25:
-            update_data["budget"] = 8
-        else:
-            update_data["budget"] = 5
-
-        # Recalculate other stats
-        matches = max(1, (runs // 25) + (wickets // 2))
-        update_data["bat_strike_rate"] = 100 * (runs / max(1, matches * 20))
-        update_data["bow_strike_rate"] = 6 * (wickets / max(1, matches * 24))
-        update_data["bat_avg"] = runs / max(1, matches)
-        update_data["econ"] = 6 * (runs / max(1, matches * 4))
-
-    # Update wickets if provided but runs not provided
-    elif player.wickets is not None:
-        update_data["wickets"] = player.wickets
-
-        # Recalculate stats
-        wickets = player.wickets
-        runs = existing_player["runs"]
-
-        # Recalculate value
-        value = runs // 10 + wickets * 5
-        update_data["value"] = value
-
-        # Recalculate budget based on new value
-        if value > 100:
-            update_data["budget"] = 15
-        elif value > 75:
-            update_data["budget"] = 12
-        elif value > 50:
-            update_data["budget"] = 10
-        elif value > 25:
-            update_data["budget"] = 8
-        else:
-            update_data["budget"] = 5
-
-        # Recalculate other stats
-        matches = max(1, (runs // 25) + (wickets // 2))
-        update_data["bat_strike_rate"] = 100 * (runs / max(1, matches * 20))
-        update_data["bow_strike_rate"] = 6 * (wickets / max(1, matches * 24))
-        update_data["bat_avg"] = runs / max(1, matches)
-        update_data["econ"] = 6 * (runs / max(1, matches * 4))
+    # Update runs and wickets and recalculate stats if either is provided
+    if player.runs is not None or player.wickets is not None:
+        runs = player.runs if player.runs is not None else existing_player["runs"]
+        wickets = (
+            player.wickets if player.wickets is not None else existing_player["wickets"]
+        )
+        update_data["runs"] = runs
+        update_data["wickets"] = wickets
+        update_data.update(derive_player_stats(runs, wickets))
 
     # Update the player
     if update_data:
         await db.players.update_one({"id": player.id}, {"$set": update_data})
+        await players_changed(db)
+
+    # Re-derive the teams holding the player from its new value and budget
+    if "value" in update_data:
+        await refresh_player_teams(player.id)
 
     # Get the updated player
-    updated_player = await db.players.find_one({"id": player.id})
+    updated_player = player_catalog.get(player.id)
 
     player_detail = PlayerDetail(
         id=updated_player["id"],
@@ -253,108 +236,100 @@ async def delete_player(
 
     # Delete the player
     await db.players.delete_one({"id": player.id})
+    await players_changed(db)
 
-    # Update all user teams that have this player
-    await db.users.update_many(
-        {f"team.{player.id}": {"$exists": True}}, {"$unset": {f"team.{player.id}": ""}}
-    )
+    # Remove the player from every team holding them
+    await refresh_player_teams(player.id)
 
     return {"success": True}
 
 
+def _tournament_rankings(players):
+    """Totals plus players ranked by runs and by wickets, best first."""
+    return {
+        "total_runs": sum(p.get("runs", 0) for p in players),
+        "total_wickets": sum(p.get("wickets", 0) for p in players),
+        "by_runs": sorted(players, key=lambda p: (-p.get("runs", 0), p["id"])),
+        "by_wickets": sorted(players, key=lambda p: (-p.get("wickets", 0), p["id"])),
+    }
+
+
 @router.get("/summary", response_model=TournamentSummary)
-async def get_tournament_summary(user_data: tuple = Depends(get_admin_user)):
+async def get_tournament_summary(
+    request: Request,
+    response: Response,
+    top: int = Query(5, ge=1, le=50),
+    user_data: tuple = Depends(get_admin_user),
+):
     """Get tournament summary (admin access)"""
     user_id, role = user_data
-    db = get_db()
-
-    # Calculate totals
-    total_runs = 0
-    total_wickets = 0
-    highest_runs_player = None
-    highest_wickets_player = None
-    highest_runs = 0
-    highest_wickets = 0
-
-    cursor = db.players.find({})
-
-    async for player in cursor:
-        total_runs += player.get("runs", 0)
-        total_wickets += player.get("wickets", 0)
-
-        # Track highest runs
-        if player.get("runs", 0) > highest_runs:
-            highest_runs = player.get("runs", 0)
-            highest_runs_player = player
-
-        # Track highest wickets
-        if player.get("wickets", 0) > highest_wickets:
-            highest_wickets = player.get("wickets", 0)
-            highest_wickets_player = player
-
-    # Convert highest_runs_player to PlayerDetail
-    highest_runs_detail = PlayerDetail(
-        id=highest_runs_player["id"],
-        name=highest_runs_player["name"],
-        university=highest_runs_player["university"],
-        budget=highest_runs_player["budget"],
-        category=highest_runs_player["category"],
-        value=highest_runs_player["value"],
-        bat_strike_rate=highest_runs_player["bat_strike_rate"],
-        bow_strike_rate=highest_runs_player["bow_strike_rate"],
-        bat_avg=highest_runs_player["bat_avg"],
-        econ=highest_runs_player["econ"],
-    )
 
-    # Convert highest_wickets_player to PlayerDetail
-    highest_wickets_detail = PlayerDetail(
-        id=highest_wickets_player["id"],
-        name=highest_wickets_player["name"],
-        university=highest_wickets_player["university"],
-        budget=highest_wickets_player["budget"],
-        category=highest_wickets_player["category"],
-        value=highest_wickets_player["value"],
-        bat_strike_rate=highest_wickets_player["bat_strike_rate"],
-        bow_strike_rate=highest_wickets_player["bow_strike_rate"],
-        bat_avg=highest_wickets_player["bat_avg"],
-        econ=highest_wickets_player["econ"],
-    )
+    etag = etag_for(CATALOG, top)
+    cached = not_modified(request, etag, CATALOG, CATALOG_MAX_AGE)
+    if cached:
+        return cached
+    add_cache_headers(response, etag, CATALOG, CATALOG_MAX_AGE)
+
+    # Rankings are rebuilt from the catalog only when players change
+    rankings = player_catalog.derive("tournament", _tournament_rankings)
+
+    top_run_scorers = [
+        PlayerDetail.model_validate(p)
+        for p in rankings["by_runs"][:top]
+        if p.get("runs", 0) > 0
+    ]
+    top_wicket_takers = [
+        PlayerDetail.model_validate(p)
+        for p in rankings["by_wickets"][:top]
+        if p.get("wickets", 0) > 0
+    ]
 
     return {
         "success": True,
-        "total_runs": total_runs,
-        "total_wickets": total_wickets,
-        "highest_runs": highest_runs_detail,
-        "highest_wickets": highest_wickets_detail,
+        "total_runs": rankings["total_runs"],
+        "total_wickets": rankings["total_wickets"],
+        "highest_runs": top_run_scorers[0] if top_run_scorers else None,
+        "highest_wickets": top_wicket_takers[0] if top_wicket_takers else None,
+        "top_run_scorers": top_run_scorers,
+        "top_wicket_takers": top_wicket_takers,
     }
 
 
 @router.get("/leaderboard", response_model=LeaderboardResponse)
-async def get_admin_leaderboard(user_data: tuple = Depends(get_admin_user)):
+async def get_admin_leaderboard(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_data: tuple = Depends(get_admin_user),
+):
     """Get leaderboard (admin access)"""
     user_id, role = user_data
-    db = get_db()
-
-    users = []
-
-    # Get all users with their teams
-    cursor = db.users.find({})
 
-    async for user in cursor:
-        team = user.get("team", {})
-
-        # Only include users with complete teams (11 players)
-        if len(team) == 11:
-            # Calculate total team points
-            points = 0
-            for player_id in team.values():
-                player = await db.players.find_one({"id": player_id})
-                if player:
-                    points += player.get("value", 0)
+    # The page carries the caller's own rank, so it varies per user
+    etag = etag_for(LEADERBOARD, user_id, skip, limit)
+    cached = not_modified(request, etag, LEADERBOARD, LEADERBOARD_MAX_AGE)
+    if cached:
+        return cached
+
+    return add_cache_headers(
+        FastJSONResponse(await get_leaderboard_page(user_id, skip, limit)),
+        etag,
+        LEADERBOARD,
+        LEADERBOARD_MAX_AGE,
+    )
 
-            users.append(LeaderboardUser(username=user["username"], points=points))
 
-    # Sort users by points (descending)
-    users.sort(key=lambda x: x.points, reverse=True)
+@router.get("/metrics")
+async def get_metrics(user_data: tuple = Depends(get_admin_user)):
+    """Get in-process cache metrics (admin access)"""
+    user_id, role = user_data
 
-    return {"success": True, "users": users}
+    return {
+        "success": True,
+        "session_cache": session_cache.stats(),
+        "chatbot_cache": response_cache.stats(),
+        "chatbot_stream_ttfb": stream_ttfb.stats(),
+        "chatbot_stream_first_token": stream_first_token.stats(),
+        "llm": llm_gateway.stats(),
+        "username_filter": username_index.stats(),
+    }
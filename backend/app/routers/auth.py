@@ -1,9 +1,16 @@
 from fastapi import APIRouter, HTTPException, Response, Cookie
 from typing import Optional
+from pymongo.errors import DuplicateKeyError
 
 from ..database import get_db
-from ..auth import hash_password, verify_password, create_session, validate_session
+from ..auth import (
+    create_session,
+    validate_session,
+    delete_session,
+)
 from ..models.user import UserRegister, UserLogin, UsernameCheck
+from ..passwords import hash_password, needs_rehash, verify_password
+from ..usernames import username_index
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -13,20 +20,28 @@ async def register(user: UserRegister):
     db = get_db()
 
     # Check if username already exists
-    existing_user = await db.users.find_one({"username": user.username})
-    if existing_user:
+    if await username_index.exists(db, user.username):
         raise HTTPException(status_code=400, detail="Username already exists")
 
     # Create new user with hashed password
     new_user = {
         "username": user.username,
-        "password": hash_password(user.password),
+        "password": await hash_password(user.password),
         "role": "user",  # Default role is user
         "budget": 100,  # Default budget
         "team": {},  # Empty team
+        "team_ids": [],  # Team player ids in position order
+        "team_size": 0,
+        "budget_used": 0,  # Summed budget of team players
+        "points": 0,  # Summed value of team players
     }
 
-    await db.users.insert_one(new_user)
+    # Another worker may have registered the name since its filter last synced
+    try:
+        await db.users.insert_one(new_user)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    await username_index.registered(db, user.username)
     return {"success": True}
 
 
@@ -44,20 +59,29 @@ async def validate_username(username_check: UsernameCheck):
     if len(username_check.username) < 8:
         return {"success": True, "availability": False}
 
-    # Check if username exists in database
-    existing_user = await db.users.find_one({"username": username_check.username})
-    return {"success": True, "availability": not bool(existing_user)}
+    # Check if username exists, querying the database only on a filter hit
+    taken = await username_index.exists(db, username_check.username)
+    return {"success": True, "availability": not taken}
 
 
 @router.post("/login")
 async def login(user: UserLogin, response: Response):
     db = get_db()
 
-    # Find user by username
+    # Find user by username; unknown usernames still cost a hash, so timing
+    # does not tell which usernames exist
     db_user = await db.users.find_one({"username": user.username})
-    if not db_user or not verify_password(db_user["password"], user.password):
+    stored_password = db_user["password"] if db_user else None
+    if not await verify_password(stored_password, user.password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    # Upgrade legacy or outdated hashes while the plain password is at hand
+    if needs_rehash(db_user["password"]):
+        await db.users.update_one(
+            {"_id": db_user["_id"]},
+            {"$set": {"password": await hash_password(user.password)}},
+        )
+
     # Create session
     session_id = await create_session(str(db_user["_id"]), db_user["role"])
 
@@ -75,11 +99,9 @@ async def login(user: UserLogin, response: Response):
 
 @router.post("/logout")
 async def logout(response: Response, session: Optional[str] = Cookie(None)):
-    db = get_db()
-
     # Delete session from database if it exists
     if session:
-        await db.sessions.delete_one({"session_id": session})
+        await delete_session(session)
 
     # Clear session cookie
     response.delete_cookie(key="session")
@@ -1,14 +1,53 @@
+import time
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
 from ..auth import get_regular_user
 from ..database import get_db
+from ..llm import LLMUnavailable
 from ..models.team import ChatbotRequest, ChatbotResponse
-from ..models.player import PlayerDetail
-from ..utils import get_openai_response, suggest_players
+from ..realtime import format_event
+from ..serialization import encode_player_detail
+from ..utils import (
+    get_openai_response,
+    stream_first_token,
+    stream_openai_response,
+    stream_ttfb,
+    suggest_players,
+)
 
 router = APIRouter(tags=["chatbot"])
 
 
+# Prefixed to local suggestions served in place of an LLM answer
+FALLBACK_NOTE = "The assistant is unavailable right now. "
+
+
+def _wants_suggestions(user_query: str) -> bool:
+    return "suggest" in user_query or "recommend" in user_query or "best" in user_query
+
+
+async def _suggestions(
+    user_query: str, team: dict, remaining_budget: int, fallback: bool = False
+) -> dict:
+    # Get player suggestions based on team composition and budget, formatted
+    # to match the PlayerDetail model
+    suggested_players, response_text = await suggest_players(
+        user_query, team, remaining_budget
+    )
+    if fallback:
+        response_text = FALLBACK_NOTE + response_text
+
+    formatted_suggestions = None
+    if suggested_players:
+        formatted_suggestions = [
+            encode_player_detail(player) for player in suggested_players
+        ]
+
+    return {"response": response_text, "suggestion": formatted_suggestions}
+
+
 @router.post("/chatbot", response_model=ChatbotResponse)
 async def chat_with_ai(
     query: ChatbotRequest, user_data: tuple = Depends(get_regular_user)
@@ -21,77 +60,110 @@ async def chat_with_ai(
         raise HTTPException(status_code=400, detail="Query cannot be empty")
 
     # Get user information
-    user = await db.users.find_one({"_id": user_id})
+    user = await db.users.find_one(
+        {"_id": user_id}, {"team": 1, "budget": 1, "budget_used": 1}
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Get user's current team
     team = user.get("team", {})
 
-    # Get all players from the database for context
-    players = []
-    async for player_doc in db.players.find({}):
-        player = {
-            "id": player_doc["id"],
-            "name": player_doc["name"],
-            "university": player_doc["university"],
-            "category": player_doc["category"],
-            "budget": player_doc["budget"],
-            "value": player_doc["value"],
-            "bat_strike_rate": player_doc["bat_strike_rate"],
-            "bow_strike_rate": player_doc["bow_strike_rate"],
-            "bat_avg": player_doc["bat_avg"],
-            "econ": player_doc["econ"],
-        }
-        players.append(player)
-
     # Get remaining budget
-    total_budget = user.get("budget", 100)
-    used_budget = 0
-    for player_id in team.values():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            used_budget += player_doc["budget"]
-    remaining_budget = total_budget - used_budget
+    remaining_budget = user.get("budget", 100) - user.get("budget_used", 0)
 
     # Analyze query intent
     user_query = query.query.lower()
 
-    suggested_players = None
-    response_text = ""
+    if _wants_suggestions(user_query):
+        return {
+            "success": True,
+            **await _suggestions(user_query, team, remaining_budget),
+        }
 
-    if "suggest" in user_query or "recommend" in user_query or "best" in user_query:
-        # Get player suggestions based on team composition and budget
-        suggested_players, response_text = await suggest_players(
-            user_query, players, team, remaining_budget
-        )
-    else:
-        # Get general response from OpenAI
-        response_text = await get_openai_response(
-            user_query, players, team, remaining_budget
+    # Get general response from OpenAI, or answer locally while it is down
+    try:
+        response_text = await get_openai_response(user_query, team, remaining_budget)
+    except LLMUnavailable:
+        return {
+            "success": True,
+            **await _suggestions(user_query, team, remaining_budget, fallback=True),
+        }
+
+    return {"success": True, "response": response_text, "suggestion": None}
+
+
+@router.post("/chatbot/stream")
+async def stream_chat_with_ai(
+    query: ChatbotRequest, user_data: tuple = Depends(get_regular_user)
+):
+    """Chat with AI assistant, streaming the answer as Server-Sent Events
+
+    The first event is always a "suggestion" event with the local player
+    suggestions, shaped like the /chatbot response. Suggestion queries end
+    there; other queries go on with "token" events carrying text as it is
+    generated, or an "error" event if the LLM is unavailable or the answer
+    breaks off. A final "done" event reports the time to the first event
+    and to the first token.
+    """
+    started = time.perf_counter()
+    user_id, role = user_data
+    db = get_db()
+
+    if not query.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    user = await db.users.find_one(
+        {"_id": user_id}, {"team": 1, "budget": 1, "budget_used": 1}
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    team = user.get("team", {})
+    remaining_budget = user.get("budget", 100) - user.get("budget_used", 0)
+    user_query = query.query.lower()
+
+    # Each event is sent before the next one is produced, so a slow client
+    # slows the upstream read instead of piling tokens up in memory. On
+    # disconnect the generator is closed, which closes the upstream stream.
+    async def events():
+        payload = await _suggestions(user_query, team, remaining_budget)
+        ttfb = time.perf_counter() - started
+        stream_ttfb.record(ttfb)
+        yield format_event("suggestion", payload)
+
+        first_token = None
+        if not _wants_suggestions(user_query):
+            tokens = stream_openai_response(user_query, team, remaining_budget)
+            try:
+                async for text in tokens:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                        stream_first_token.record(first_token)
+                    yield format_event("token", {"text": text})
+            except LLMUnavailable:
+                # The suggestions already sent stand in for the answer
+                detail = (
+                    FALLBACK_NOTE.strip()
+                    if first_token is None
+                    else "The answer was interrupted"
+                )
+                yield format_event("error", {"detail": detail})
+            finally:
+                await tokens.aclose()
+
+        yield format_event(
+            "done",
+            {
+                "ttfb_ms": round(ttfb * 1000, 1),
+                "first_token_ms": (
+                    round(first_token * 1000, 1) if first_token is not None else None
+                ),
+            },
         )
 
-    # Format suggested players to match the PlayerDetail model
-    formatted_suggestions = None
-    if suggested_players:
-        formatted_suggestions = []
-        for player in suggested_players:
-            formatted_player = PlayerDetail(
-                id=player["id"],
-                name=player["name"],
-                university=player["university"],
-                budget=player["budget"],
-                category=player["category"],
-                value=player["value"],
-                bat_strike_rate=player["bat_strike_rate"],
-                bow_strike_rate=player["bow_strike_rate"],
-                bat_avg=player["bat_avg"],
-                econ=player["econ"],
-            )
-            formatted_suggestions.append(formatted_player)
-
-    return {
-        "success": True,
-        "response": response_text,
-        "suggestion": formatted_suggestions,
-    }
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,43 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from ..auth import get_regular_user
+from ..leaderboard import get_leaderboard_page
+from ..realtime import TOP_N, format_event, leaderboard_hub
+
+router = APIRouter(tags=["realtime"])
+
+# Comment lines sent while idle so proxies keep the stream open
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/leaderboard/stream")
+async def stream_leaderboard(user_data: tuple = Depends(get_regular_user)):
+    """Stream leaderboard and team point changes as Server-Sent Events"""
+    user_id, role = user_data
+
+    snapshot = await get_leaderboard_page(user_id, 0, TOP_N)
+    queue = await leaderboard_hub.subscribe(user_id)
+
+    async def events():
+        try:
+            yield format_event("snapshot", snapshot)
+            while True:
+                try:
+                    name, data = await asyncio.wait_for(
+                        queue.get(), timeout=HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+                    continue
+                yield format_event(name, data)
+        finally:
+            leaderboard_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,12 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 
 from ..auth import get_regular_user
+from ..catalog import player_catalog
 from ..database import get_db
+from ..http_cache import (
+    CATALOG,
+    CATALOG_MAX_AGE,
+    LEADERBOARD,
+    LEADERBOARD_MAX_AGE,
+    add_cache_headers,
+    etag_for,
+    not_modified,
+)
+from ..leaderboard import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_leaderboard_page
 from ..models.player import (
-    PlayerBase,
     PlayerDetail,
     PlayerRequest,
-    PlayerArrayResponse,
+    PlayerPageResponse,
+    PlayerQuery,
     PlayerResponse,
 )
 from ..models.team import (
@@ -14,33 +28,44 @@ from ..models.team import (
     TeamPlayerRequest,
     BudgetResponse,
     LeaderboardResponse,
-    LeaderboardUser,
+    TeamOptimizeRequest,
+    TeamOptimizeResponse,
+)
+from ..optimizer import optimize_team
+from ..players import query_players
+from ..serialization import FastJSONResponse, encode_player_detail
+from ..suggestions import SuggestionIndex
+from ..teams import (
+    TEAM_SIZE,
+    add_to_team,
+    get_player_cost,
+    remove_from_team,
+    team_response,
 )
 
 router = APIRouter(tags=["user"])
 
 
-@router.get("/players", response_model=PlayerArrayResponse)
-async def get_players(user_data: tuple = Depends(get_regular_user)):
-    """Get all players (user access)"""
+@router.get("/players", response_model=PlayerPageResponse)
+async def get_players(
+    request: Request,
+    query: Annotated[PlayerQuery, Query()],
+    user_data: tuple = Depends(get_regular_user),
+):
+    """Get players, optionally filtered, sorted and paginated (user access)"""
     user_id, role = user_data
-    db = get_db()
 
-    players = []
-    cursor = db.players.find({})
-
-    async for doc in cursor:
-        player = PlayerBase(
-            id=doc["id"],
-            name=doc["name"],
-            university=doc["university"],
-            budget=doc["budget"],
-            category=doc["category"],
-            value=doc["value"],
-        )
-        players.append(player)
+    etag = etag_for(CATALOG, request.url.query)
+    cached = not_modified(request, etag, CATALOG, CATALOG_MAX_AGE)
+    if cached:
+        return cached
 
-    return {"success": True, "player_array": players}
+    try:
+        page = query_players(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return add_cache_headers(FastJSONResponse(page), etag, CATALOG, CATALOG_MAX_AGE)
 
 
 @router.post("/players", response_model=PlayerResponse)
@@ -49,9 +74,8 @@ async def get_player_detail(
 ):
     """Get player detail (user access)"""
     user_id, role = user_data
-    db = get_db()
 
-    player_doc = await db.players.find_one({"id": player_req.id})
+    player_doc = player_catalog.get(player_req.id)
     if not player_doc:
         raise HTTPException(status_code=404, detail="Player not found")
 
@@ -81,42 +105,7 @@ async def get_team(user_data: tuple = Depends(get_regular_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    team_data = user.get("team", {})
-    players_dict = {}
-    total_points = 0
-
-    # Convert team data to dictionary of player objects
-    for position, player_id in team_data.items():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            player = PlayerDetail(
-                id=player_doc["id"],
-                name=player_doc["name"],
-                university=player_doc["university"],
-                budget=player_doc["budget"],
-                category=player_doc["category"],
-                value=player_doc["value"],
-                bat_strike_rate=player_doc["bat_strike_rate"],
-                bow_strike_rate=player_doc["bow_strike_rate"],
-                bat_avg=player_doc["bat_avg"],
-                econ=player_doc["econ"],
-            )
-            players_dict[position] = player
-            total_points += player_doc["value"]
-
-    # Fill in null values for missing positions
-    for i in range(1, 12):
-        pos = str(i)
-        if pos not in players_dict:
-            players_dict[pos] = None
-
-    # Only include total_points if team is complete
-    result = {"success": True, "username": user["username"], "players": players_dict}
-
-    if len(team_data) == 11:
-        result["total_points"] = total_points
-
-    return result
+    return FastJSONResponse(await team_response(user["username"], user.get("team", {})))
 
 
 @router.post("/team", response_model=Team)
@@ -127,78 +116,33 @@ async def add_player_to_team(
     user_id, role = user_data
     db = get_db()
 
-    # Get user and check if exists
-    user = await db.users.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Get player and check if exists
-    player = await db.players.find_one({"id": team_req.playerId})
+    player = await get_player_cost(team_req.playerId)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    # Get current team
-    team_data = user.get("team", {})
+    # Add player to team, guarded on team size, membership and budget
+    user = await add_to_team(user_id, player)
+    if user:
+        return FastJSONResponse(await team_response(user["username"], user["team"]))
+
+    # The update did not apply, so work out which guard failed
+    user = await db.users.find_one(
+        {"_id": user_id}, {"team_ids": 1, "budget": 1, "budget_used": 1}
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    team_ids = user.get("team_ids", [])
+    if team_req.playerId in team_ids:
+        raise HTTPException(status_code=400, detail="Player already in team")
 
-    # Check team size limit
-    if len(team_data) >= 11:
+    if len(team_ids) >= TEAM_SIZE:
         raise HTTPException(
             status_code=400, detail="Team size limit reached (11 players)"
         )
 
-    # Calculate current budget used
-    current_budget_used = 0
-    for player_id in team_data.values():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            current_budget_used += player_doc["budget"]
-
-    # Check budget
-    if current_budget_used + player["budget"] > user.get("budget", 100):
-        raise HTTPException(status_code=400, detail="Insufficient budget")
-
-    # Find next available position
-    next_position = str(len(team_data) + 1)
-
-    # Add player to team
-    team_data[next_position] = team_req.playerId
-    await db.users.update_one({"_id": user_id}, {"$set": {"team": team_data}})
-
-    # Get updated team for response
-    players_dict = {}
-    total_points = 0
-
-    for position, player_id in team_data.items():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            player_detail = PlayerDetail(
-                id=player_doc["id"],
-                name=player_doc["name"],
-                university=player_doc["university"],
-                budget=player_doc["budget"],
-                category=player_doc["category"],
-                value=player_doc["value"],
-                bat_strike_rate=player_doc["bat_strike_rate"],
-                bow_strike_rate=player_doc["bow_strike_rate"],
-                bat_avg=player_doc["bat_avg"],
-                econ=player_doc["econ"],
-            )
-            players_dict[position] = player_detail
-            total_points += player_doc["value"]
-
-    # Fill in null values for missing positions
-    for i in range(1, 12):
-        pos = str(i)
-        if pos not in players_dict:
-            players_dict[pos] = None
-
-    # Only include total_points if team is complete
-    result = {"success": True, "username": user["username"], "players": players_dict}
-
-    if len(team_data) == 11:
-        result["total_points"] = total_points
-
-    return result
+    raise HTTPException(status_code=400, detail="Insufficient budget")
 
 
 @router.delete("/team", response_model=Team)
@@ -209,73 +153,68 @@ async def remove_player_from_team(
     user_id, role = user_data
     db = get_db()
 
-    # Get user and check if exists
-    user = await db.users.find_one({"_id": user_id})
+    # Remove player from team, keeping positions consecutive
+    user = await remove_from_team(user_id, team_req.playerId)
+    if user:
+        return FastJSONResponse(await team_response(user["username"], user["team"]))
+
+    # The update did not apply, so work out why
+    if not await db.users.find_one({"_id": user_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    raise HTTPException(status_code=404, detail="Player not found in team")
+
+
+@router.post("/team/optimize", response_model=TeamOptimizeResponse)
+async def optimize_user_team(
+    optimize_req: Optional[TeamOptimizeRequest] = None,
+    user_data: tuple = Depends(get_regular_user),
+):
+    """Propose the most valuable players to fill the team within budget"""
+    user_id, role = user_data
+    db = get_db()
+
+    user = await db.users.find_one(
+        {"_id": user_id}, {"team_ids": 1, "budget": 1, "budget_used": 1}
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Get current team
-    team_data = user.get("team", {})
-
-    # Check if player is in team
-    player_position = None
-    for position, player_id in team_data.items():
-        if player_id == team_req.playerId:
-            player_position = position
-            break
-
-    if player_position is None:
-        raise HTTPException(status_code=404, detail="Player not found in team")
-
-    # Remove player from team
-    del team_data[player_position]
-
-    # Reorder positions to ensure consecutive numbering
-    new_team_data = {}
-    position_index = 1
-
-    for _, player_id in sorted(team_data.items(), key=lambda x: int(x[0])):
-        new_team_data[str(position_index)] = player_id
-        position_index += 1
-
-    # Update user's team
-    await db.users.update_one({"_id": user_id}, {"$set": {"team": new_team_data}})
-
-    # Get updated team for response
-    players_dict = {}
-    total_points = 0
-
-    for position, player_id in new_team_data.items():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            player_detail = PlayerDetail(
-                id=player_doc["id"],
-                name=player_doc["name"],
-                university=player_doc["university"],
-                budget=player_doc["budget"],
-                category=player_doc["category"],
-                value=player_doc["value"],
-                bat_strike_rate=player_doc["bat_strike_rate"],
-                bow_strike_rate=player_doc["bow_strike_rate"],
-                bat_avg=player_doc["bat_avg"],
-                econ=player_doc["econ"],
-            )
-            players_dict[position] = player_detail
-            total_points += player_doc["value"]
-
-    # Fill in null values for missing positions
-    for i in range(1, 12):
-        pos = str(i)
-        if pos not in players_dict:
-            players_dict[pos] = None
-
-    # Only include total_points if team is complete
-    result = {"success": True, "username": user["username"], "players": players_dict}
-
-    if len(new_team_data) == 11:
-        result["total_points"] = total_points
-
-    return result
+    team_ids = user.get("team_ids", [])
+    locked = [player_catalog.get(player_id) for player_id in team_ids]
+    locked = [player for player in locked if player]
+    remaining = user.get("budget", 100) - user.get("budget_used", 0)
+    quotas = {}
+    if optimize_req:
+        quotas = {
+            category: (quota.min, quota.max)
+            for category, quota in optimize_req.quotas.items()
+        }
+
+    # The search is CPU-bound, so keep it off the event loop
+    index = player_catalog.derive("suggestion_index", SuggestionIndex)
+    try:
+        picks, optimal = await asyncio.to_thread(
+            optimize_team,
+            index,
+            locked,
+            remaining,
+            TEAM_SIZE - len(team_ids),
+            quotas,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    spent = sum(player["budget"] for player in picks)
+    return FastJSONResponse(
+        {
+            "success": True,
+            "optimal": optimal,
+            "players": [encode_player_detail(player) for player in picks],
+            "budget_used": user.get("budget_used", 0) + spent,
+            "remaining": remaining - spent,
+        }
+    )
 
 
 @router.get("/budget", response_model=BudgetResponse)
@@ -284,19 +223,12 @@ async def get_budget(user_data: tuple = Depends(get_regular_user)):
     user_id, role = user_data
     db = get_db()
 
-    user = await db.users.find_one({"_id": user_id})
+    user = await db.users.find_one({"_id": user_id}, {"budget": 1, "budget_used": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     total_budget = user.get("budget", 100)
-    team_data = user.get("team", {})
-
-    # Calculate used budget
-    used_budget = 0
-    for player_id in team_data.values():
-        player_doc = await db.players.find_one({"id": player_id})
-        if player_doc:
-            used_budget += player_doc["budget"]
+    used_budget = user.get("budget_used", 0)
 
     return {
         "success": True,
@@ -307,31 +239,24 @@ async def get_budget(user_data: tuple = Depends(get_regular_user)):
 
 
 @router.get("/leaderboard", response_model=LeaderboardResponse)
-async def get_leaderboard(user_data: tuple = Depends(get_regular_user)):
+async def get_leaderboard(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_data: tuple = Depends(get_regular_user),
+):
     """Get user leaderboard"""
     user_id, role = user_data
-    db = get_db()
-
-    users = []
-
-    # Get all users with their teams
-    cursor = db.users.find({})
 
-    async for user in cursor:
-        team = user.get("team", {})
-
-        # Only include users with complete teams (11 players)
-        if len(team) == 11:
-            # Calculate total team points
-            points = 0
-            for player_id in team.values():
-                player = await db.players.find_one({"id": player_id})
-                if player:
-                    points += player.get("value", 0)
-
-            users.append(LeaderboardUser(username=user["username"], points=points))
-
-    # Sort users by points (descending)
-    users.sort(key=lambda x: x.points, reverse=True)
-
-    return {"success": True, "users": users}
+    # The page carries the caller's own rank, so it varies per user
+    etag = etag_for(LEADERBOARD, user_id, skip, limit)
+    cached = not_modified(request, etag, LEADERBOARD, LEADERBOARD_MAX_AGE)
+    if cached:
+        return cached
+
+    return add_cache_headers(
+        FastJSONResponse(await get_leaderboard_page(user_id, skip, limit)),
+        etag,
+        LEADERBOARD,
+        LEADERBOARD_MAX_AGE,
+    )
@@ -0,0 +1,63 @@
+import json
+from operator import itemgetter
+from typing import Any, Callable, Dict, Mapping, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from .models.player import PlayerBase, PlayerDetail
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up; fall back to json
+    orjson = None
+
+
+def compile_row_encoder(
+    model: Type[BaseModel],
+) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    """
+    Build a function copying a model's fields out of a stored document.
+
+    The field list is resolved once, so encoding a row is a single itemgetter
+    call instead of constructing and validating a model instance. Documents
+    must already hold values of the model's types, as player documents do.
+
+    Args:
+        model: Response model whose fields should be copied
+
+    Returns:
+        Function mapping a document to a dict of the model's fields
+    """
+    fields = tuple(model.model_fields)
+    getter = itemgetter(*fields)
+
+    def encode(doc: Mapping[str, Any]) -> Dict[str, Any]:
+        return dict(zip(fields, getter(doc)))
+
+    return encode
+
+
+encode_player_base = compile_row_encoder(PlayerBase)
+encode_player_detail = compile_row_encoder(PlayerDetail)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for content that is already in its response schema.
+
+    Returning it from a route skips FastAPI's response_model validation and
+    serialization, so routes opt in only where they build plain dicts that
+    match their response model.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
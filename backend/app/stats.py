@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional speed-up for large batches
+    np = None
+
+# Below this size the pure Python path beats the cost of building arrays
+NUMPY_MIN_BATCH = 64
+
+DERIVED_FIELDS = (
+    "value",
+    "budget",
+    "bat_strike_rate",
+    "bow_strike_rate",
+    "bat_avg",
+    "econ",
+)
+
+
+def budget_for_value(value: int) -> int:
+    """Map a player's value to their budget tier."""
+    if value > 100:
+        return 15
+    elif value > 75:
+        return 12
+    elif value > 50:
+        return 10
+    elif value > 25:
+        return 8
+    else:
+        return 5
+
+
+def derive_player_stats(runs: int, wickets: int) -> Dict[str, Any]:
+    """
+    Compute the derived fields of a single player.
+
+    Args:
+        runs: Runs scored by the player
+        wickets: Wickets taken by the player
+
+    Returns:
+        Dict with the player's value, budget, strike rates, average and economy
+    """
+    # Calculate player value based on runs and wickets
+    value = runs // 10 + wickets * 5
+
+    # Estimate matches, balls faced, balls bowled and overs bowled
+    matches = max(1, (runs // 25) + (wickets // 2))
+
+    return {
+        "value": value,
+        "budget": budget_for_value(value),
+        "bat_strike_rate": 100 * (runs / max(1, matches * 20)),
+        "bow_strike_rate": 6 * (wickets / max(1, matches * 24)),
+        "bat_avg": runs / max(1, matches),
+        "econ": 6 * (runs / max(1, matches * 4)),
+    }
+
+
+def _derive_stats_numpy(runs: Sequence[int], wickets: Sequence[int]) -> Dict[str, List]:
+    runs = np.asarray(runs, dtype=np.int64)
+    wickets = np.asarray(wickets, dtype=np.int64)
+
+    value = runs // 10 + wickets * 5
+    matches = np.maximum(1, (runs // 25) + (wickets // 2))
+    budget = np.select(
+        [value > 100, value > 75, value > 50, value > 25], [15, 12, 10, 8], 5
+    )
+
+    return {
+        "value": value.tolist(),
+        "budget": budget.tolist(),
+        "bat_strike_rate": (100 * (runs / np.maximum(1, matches * 20))).tolist(),
+        "bow_strike_rate": (6 * (wickets / np.maximum(1, matches * 24))).tolist(),
+        "bat_avg": (runs / np.maximum(1, matches)).tolist(),
+        "econ": (6 * (runs / np.maximum(1, matches * 4))).tolist(),
+    }
+
+
+def derive_stats(runs: Sequence[int], wickets: Sequence[int]) -> Dict[str, List]:
+    """
+    Compute the derived player fields for a batch of players, column by column.
+
+    Large batches are vectorized with numpy when it is installed; the results
+    match derive_player_stats exactly either way.
+
+    Args:
+        runs: Runs of each player
+        wickets: Wickets of each player, aligned with runs
+
+    Returns:
+        Dict of column name to the list of values for each player
+    """
+    if np is not None and len(runs) >= NUMPY_MIN_BATCH:
+        return _derive_stats_numpy(runs, wickets)
+
+    rows = [derive_player_stats(r, w) for r, w in zip(runs, wickets)]
+    return {field: [row[field] for row in rows] for field in DERIVED_FIELDS}
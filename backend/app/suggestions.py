@@ -0,0 +1,106 @@
+import heapq
+from bisect import bisect_right
+from itertools import groupby, islice
+from typing import Any, Collection, Dict, Iterable, List
+
+
+def _rank(player: Dict[str, Any]):
+    # Best value first; ties go to the lower id so results are stable
+    return -player["value"], player["id"]
+
+
+class SuggestionIndex:
+    """Players bucketed by category and budget tier, each tier sorted by value.
+
+    A budget-bounded lookup bisects the sorted tier budgets of each wanted
+    category and lazily merges the affordable tiers, so the top k players
+    come out without scanning or sorting the whole catalog.
+
+    Built from catalog player documents, which are shared and read-only.
+    """
+
+    def __init__(self, players: List[Dict[str, Any]]):
+        # category -> (ascending tier budgets, players of each tier by value)
+        self._categories: Dict[str, tuple] = {}
+        self.min_budget = min((p["budget"] for p in players), default=0)
+
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for player in players:
+            by_category.setdefault(player["category"], []).append(player)
+
+        for category, members in by_category.items():
+            members.sort(key=lambda p: p["budget"])
+            budgets, tiers = [], []
+            for budget, tier in groupby(members, key=lambda p: p["budget"]):
+                budgets.append(budget)
+                tiers.append(sorted(tier, key=_rank))
+            self._categories[category] = (budgets, tiers)
+
+    def categories(self) -> List[str]:
+        """Get every category present in the catalog."""
+        return list(self._categories)
+
+    def tiers(self, category: str) -> List[tuple]:
+        """Get (budget, players by value) pairs of a category, cheapest first."""
+        budgets, tiers = self._categories.get(category, ((), ()))
+        return list(zip(budgets, tiers))
+
+    def categories_for(
+        self, batters: bool, bowlers: bool, all_rounders: bool
+    ) -> List[str]:
+        """Get the categories a batter/bowler/all-rounder request refers to."""
+        matched = []
+        for category in self._categories:
+            name = category.lower()
+            if (
+                (batters and "bat" in name)
+                or (bowlers and "bowl" in name)
+                or (all_rounders and ("all" in name or "round" in name))
+            ):
+                matched.append(category)
+        return matched
+
+    def max_pick_budget(self, remaining_budget: int, slots_left: int) -> int:
+        """
+        Get the most one pick can cost while the team can still be completed.
+
+        After this pick, slots_left - 1 slots remain, and each of them costs
+        at least the cheapest budget in the catalog.
+
+        Args:
+            remaining_budget: Budget the user has left
+            slots_left: Empty slots in the team, including this pick
+
+        Returns:
+            Budget ceiling for the next pick
+        """
+        if slots_left <= 1:
+            return remaining_budget
+        return remaining_budget - (slots_left - 1) * self.min_budget
+
+    def top(
+        self,
+        categories: Iterable[str],
+        max_budget: int,
+        exclude: Collection[int] = (),
+        k: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the k most valuable players within a budget.
+
+        Args:
+            categories: Categories to draw from
+            max_budget: Highest budget a returned player may have
+            exclude: Player ids to skip, such as the current team
+            k: Number of players to return
+
+        Returns:
+            Player documents ordered by descending value
+        """
+        streams = []
+        for category in categories:
+            budgets, tiers = self._categories.get(category, ((), ()))
+            streams.extend(tiers[: bisect_right(budgets, max_budget)])
+
+        merged = heapq.merge(*streams, key=_rank)
+        return list(islice((p for p in merged if p["id"] not in exclude), k))
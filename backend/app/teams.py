@@ -0,0 +1,379 @@
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReadPreference, ReturnDocument, UpdateOne
+
+from . import versions
+from .catalog import player_catalog
+from .database import get_db
+from .models.player import PlayerDetail
+from .serialization import encode_player_detail
+
+TEAM_SIZE = 11
+
+PLAYER_DETAIL_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in PlayerDetail.model_fields},
+}
+
+
+async def hydrate_team(team_data: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Resolve a team's player ids into player details and totals.
+
+    Players are read from the catalog; any the catalog does not know about
+    are fetched together in a single $in query.
+
+    Args:
+        team_data: Team map of position to player id
+
+    Returns:
+        Dict with the PlayerDetail fields of the players by position
+        ("1".."11", None for empty slots),
+        the budget used and the total points of the team
+    """
+    docs = {}
+    missing = []
+    for player_id in team_data.values():
+        player_doc = player_catalog.get(player_id)
+        if player_doc:
+            docs[player_id] = player_doc
+        else:
+            missing.append(player_id)
+
+    if missing:
+        db = get_db()
+        cursor = db.players.find({"id": {"$in": missing}}, PLAYER_DETAIL_PROJECTION)
+        async for player_doc in cursor:
+            docs[player_doc["id"]] = player_doc
+
+    players = {str(i): None for i in range(1, TEAM_SIZE + 1)}
+    budget_used = 0
+    points = 0
+
+    for position, player_id in sorted(team_data.items(), key=lambda x: int(x[0])):
+        player_doc = docs.get(player_id)
+        if player_doc:
+            players[position] = encode_player_detail(player_doc)
+            budget_used += player_doc["budget"]
+            points += player_doc["value"]
+
+    return {"players": players, "budget_used": budget_used, "points": points}
+
+
+async def team_response(username: str, team_data: Dict[str, int]) -> Dict[str, Any]:
+    """Build the Team response body for a user's team."""
+    team = await hydrate_team(team_data)
+
+    # Only report total_points if team is complete
+    return {
+        "success": True,
+        "username": username,
+        "players": team["players"],
+        "total_points": team["points"] if len(team_data) == TEAM_SIZE else None,
+    }
+
+
+# User documents keep the team both as the position map returned by the API
+# and as an ordered team_ids array, together with the denormalized budget_used
+# and points totals. Team mutations rewrite all of them in a single pipeline
+# update so concurrent requests can never leave them out of step. Users
+# written before these fields existed are backfilled at startup.
+_TEAM_IDS = "$team_ids"
+_BUDGET_USED = {"$ifNull": ["$budget_used", 0]}
+_POINTS = {"$ifNull": ["$points", 0]}
+
+TEAM_PROJECTION = {"username": 1, "team": 1}
+
+
+def _positions_from_ids(ids) -> Dict[str, Any]:
+    """Expression rebuilding the position map from an ordered id array."""
+    # Teams never hold more than TEAM_SIZE players, so positions are taken
+    # from a constant list
+    return {
+        "$arrayToObject": {
+            "$map": {
+                "input": {
+                    "$filter": {
+                        "input": list(range(TEAM_SIZE)),
+                        "as": "i",
+                        "cond": {"$lt": ["$$i", {"$size": ids}]},
+                    }
+                },
+                "as": "i",
+                "in": {
+                    "k": {"$toString": {"$add": ["$$i", 1]}},
+                    "v": {"$arrayElemAt": [ids, "$$i"]},
+                },
+            }
+        }
+    }
+
+
+def _rebuild_team(budget_delta: int, points_delta: int) -> Dict[str, Any]:
+    """Pipeline stage deriving the team map and totals from team_ids."""
+    return {
+        "$set": {
+            "team": _positions_from_ids("$team_ids"),
+            "team_size": {"$size": "$team_ids"},
+            "budget_used": {"$add": [_BUDGET_USED, budget_delta]},
+            "points": {"$add": [_POINTS, points_delta]},
+        }
+    }
+
+
+def _without_player(player_id: int, budget: int, value: int) -> List[Dict[str, Any]]:
+    """Pipeline removing a player from team_ids and compacting positions."""
+    return [
+        {
+            "$set": {
+                "team_ids": {
+                    "$filter": {
+                        "input": _TEAM_IDS,
+                        "cond": {"$ne": ["$$this", player_id]},
+                    }
+                }
+            }
+        },
+        _rebuild_team(-budget, -value),
+    ]
+
+
+async def get_player_cost(player_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Read the id, budget and value a player adds to a team, from the primary.
+
+    Team mutations use this rather than the catalog, which may not have
+    caught up with an admin edit yet.
+    """
+    db = get_db()
+    players = db.get_collection("players", read_preference=ReadPreference.PRIMARY)
+    return await players.find_one(
+        {"id": player_id}, {"_id": 0, "id": 1, "budget": 1, "value": 1}
+    )
+
+
+async def _settle(
+    user_id: str,
+    player_id: int,
+    player: Optional[Dict[str, Any]],
+    user: Dict[str, Any],
+) -> Dict[str, Any]:
+    # An admin edit or delete of the player may have landed between reading
+    # its cost and updating the team, with its refresh_player_teams fan-out
+    # missing this team. If the cost moved, re-derive the team from scratch.
+    if await get_player_cost(player_id) == player:
+        return user
+
+    db = get_db()
+    await refresh_teams({"_id": user_id})
+    return await db.users.find_one({"_id": user_id}, TEAM_PROJECTION)
+
+
+async def add_to_team(user_id: str, player: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Append a player to a user's team in one conditional update.
+
+    The update only applies while the team has a free slot, the player is not
+    already in it and the player's budget still fits.
+
+    Args:
+        user_id: Id of the team owner
+        player: Player document to add
+
+    Returns:
+        The updated user (username and team), or None if a guard failed
+    """
+    db = get_db()
+    user = await db.users.find_one_and_update(
+        {
+            "_id": user_id,
+            "team_ids": {"$ne": player["id"]},
+            "$expr": {
+                "$and": [
+                    {"$lt": [{"$size": _TEAM_IDS}, TEAM_SIZE]},
+                    {
+                        "$lte": [
+                            {"$add": [_BUDGET_USED, player["budget"]]},
+                            {"$ifNull": ["$budget", 100]},
+                        ]
+                    },
+                ]
+            },
+        },
+        [
+            {"$set": {"team_ids": {"$concatArrays": [_TEAM_IDS, [player["id"]]]}}},
+            _rebuild_team(player["budget"], player["value"]),
+        ],
+        projection=TEAM_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if user:
+        user = await _settle(user_id, player["id"], player, user)
+    # Only complete teams are on the leaderboard, so only completing one
+    # changes it
+    if user and len(user["team"]) == TEAM_SIZE:
+        await versions.bump(db, "teams")
+    return user
+
+
+async def remove_from_team(user_id: str, player_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Remove a player from a user's team in one conditional update.
+
+    Remaining players move up so positions stay consecutive.
+
+    Args:
+        user_id: Id of the team owner
+        player_id: Id of the player to remove
+
+    Returns:
+        The updated user (username and team), or None if the player
+        is not in the team
+    """
+    db = get_db()
+
+    # Players deleted since they were added no longer count towards the totals
+    player = await get_player_cost(player_id)
+    budget = player["budget"] if player else 0
+    value = player["value"] if player else 0
+
+    user = await db.users.find_one_and_update(
+        {"_id": user_id, "team_ids": player_id},
+        _without_player(player_id, budget, value),
+        projection=TEAM_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if user:
+        user = await _settle(user_id, player_id, player, user)
+    # The leaderboard only changes if the team was complete before
+    if user and len(user["team"]) == TEAM_SIZE - 1:
+        await versions.bump(db, "teams")
+    return user
+
+
+def _team_fields(
+    team_ids: List[int], players: Dict[int, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Denormalized team fields of a team, from its players' absolute costs."""
+    return {
+        "team": {str(i): pid for i, pid in enumerate(team_ids, 1)},
+        "team_ids": team_ids,
+        "team_size": len(team_ids),
+        "budget_used": sum(players[pid]["budget"] for pid in team_ids),
+        "points": sum(players[pid]["value"] for pid in team_ids),
+    }
+
+
+async def refresh_teams(query: Dict[str, Any]) -> int:
+    """
+    Re-derive the team fields of users from their players' current costs.
+
+    Totals are summed from absolute budgets and values read from the
+    primary, never applied as deltas, and players that no longer exist are
+    dropped. A user is only rewritten if their team_ids are unchanged since
+    they were read; users changed in between are read again and retried, so
+    a concurrent add or remove is never overwritten.
+
+    Args:
+        query: Filter selecting the users to refresh
+
+    Returns:
+        Number of users whose team fields changed
+    """
+    db = get_db()
+    players_collection = db.get_collection(
+        "players", read_preference=ReadPreference.PRIMARY
+    )
+    changed = 0
+    while True:
+        users = await db.users.find(query, {"team_ids": 1}).to_list(length=None)
+        player_ids = list({pid for user in users for pid in user.get("team_ids", [])})
+        players = {}
+        async for player_doc in players_collection.find(
+            {"id": {"$in": player_ids}}, {"_id": 0, "id": 1, "budget": 1, "value": 1}
+        ):
+            players[player_doc["id"]] = player_doc
+
+        retry = []
+        for user in users:
+            team_ids = user.get("team_ids", [])
+            kept = [pid for pid in team_ids if pid in players]
+            result = await db.users.update_one(
+                {"_id": user["_id"], "team_ids": team_ids},
+                {"$set": _team_fields(kept, players)},
+            )
+            if result.matched_count:
+                changed += result.modified_count
+            else:
+                retry.append(user["_id"])
+
+        if not retry:
+            return changed
+        query = {"_id": {"$in": retry}}
+
+
+async def refresh_player_teams(player_id: int):
+    """Re-derive every team holding a player after the player changed."""
+    db = get_db()
+    # Published only once every team holds the new totals
+    if await refresh_teams({"team_ids": player_id}):
+        await versions.bump(db, "teams")
+
+
+async def rebuild_team_totals(
+    db, batch_size: int = 1000, query: Optional[Dict[str, Any]] = None
+) -> int:
+    """
+    Re-derive the denormalized team fields of users from their team map.
+
+    Used to backfill users created before the fields existed and to repair
+    totals that drifted from the players collection. Players that no longer
+    exist are dropped from teams.
+
+    Args:
+        db: Database to repair
+        batch_size: Number of users to rewrite per bulk write
+        query: Only rewrite users matching this filter (defaults to all)
+
+    Returns:
+        Number of users rewritten
+    """
+    query = query or {}
+    players = {}
+    async for player_doc in db.players.find(
+        {}, {"_id": 0, "id": 1, "budget": 1, "value": 1}
+    ):
+        players[player_doc["id"]] = player_doc
+
+    updated = 0
+    batch = []
+    async for user in db.users.find(query, {"team": 1}):
+        team_data = user.get("team") or {}
+        team_ids = [
+            player_id
+            for _, player_id in sorted(team_data.items(), key=lambda x: int(x[0]))
+            if player_id in players
+        ]
+        batch.append(
+            UpdateOne(
+                {"_id": user["_id"], **query},
+                {"$set": _team_fields(team_ids, players)},
+            )
+        )
+        if len(batch) >= batch_size:
+            await db.users.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+
+    if batch:
+        await db.users.bulk_write(batch, ordered=False)
+        updated += len(batch)
+
+    if updated:
+        await versions.bump(db, "teams")
+    return updated
+
+
+async def backfill_team_fields() -> int:
+    """Derive the team fields of users written before they existed."""
+    return await rebuild_team_totals(get_db(), query={"team_ids": {"$exists": False}})
@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from . import versions
+from .bloom import BloomFilter
+
+# Usernames the filter is sized for, and its target false-positive rate.
+# At the defaults the filter takes about 1.2 MB.
+USERNAME_FILTER_CAPACITY = int(os.getenv("USERNAME_FILTER_CAPACITY", "1000000"))
+USERNAME_FILTER_ERROR_RATE = float(os.getenv("USERNAME_FILTER_ERROR_RATE", "0.01"))
+
+# Users inserted by other workers are picked up by _id, with this margin for
+# clock skew between the machines generating ObjectIds
+SYNC_MARGIN = timedelta(seconds=60)
+
+
+class UsernameIndex:
+    """Bloom filter of registered usernames, kept in step across workers.
+
+    A username the filter does not contain is definitely available, so
+    availability checks only query the users collection on a possible hit.
+    """
+
+    def __init__(self):
+        self._filter = BloomFilter(USERNAME_FILTER_CAPACITY, USERNAME_FILTER_ERROR_RATE)
+        self._synced_at = None
+
+    async def load(self, db):
+        """Rebuild the filter from every user."""
+        synced_at = datetime.utcnow()
+        count = await db.users.estimated_document_count()
+        bloom = BloomFilter(
+            max(USERNAME_FILTER_CAPACITY, 2 * count), USERNAME_FILTER_ERROR_RATE
+        )
+        async for user in db.users.find({}, {"_id": 0, "username": 1}):
+            bloom.add(user["username"])
+        self._filter = bloom
+        self._synced_at = synced_at
+
+    async def sync(self, db):
+        """Add the users registered since the last load or sync."""
+        if self._synced_at is None:
+            await self.load(db)
+            return
+
+        synced_at = datetime.utcnow()
+        since = ObjectId.from_datetime(self._synced_at - SYNC_MARGIN)
+        cursor = db.users.find({"_id": {"$gte": since}}, {"_id": 0, "username": 1})
+        async for user in cursor:
+            self._filter.add(user["username"])
+        self._synced_at = synced_at
+
+    async def exists(self, db, username: str) -> bool:
+        """Check whether a username is taken."""
+        if username not in self._filter:
+            return False
+        return await db.users.find_one({"username": username}, {"_id": 1}) is not None
+
+    async def registered(self, db, username: str):
+        """Record a new username and tell the other workers."""
+        self._filter.add(username)
+        await versions.bump(db, "usernames")
+
+    def stats(self):
+        """Report the filter's size, item count and expected error rate."""
+        return self._filter.stats()
+
+
+username_index = UsernameIndex()
+
+versions.subscribe("usernames", username_index.sync)
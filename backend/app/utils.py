@@ -1,34 +1,66 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Dict, List, Optional, Tuple, Any
+import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from .cache import AsyncTTLCache
+from .catalog import player_catalog
+from .llm import LLMUnavailable, llm_gateway
+from .metrics import LatencyRecorder
+from .suggestions import SuggestionIndex
+from .teams import TEAM_SIZE
+
 load_dotenv()
 # Initialize OpenAI client
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+logger = logging.getLogger(__name__)
 
-async def get_openai_response(
-    query: str,
-    players: List[Dict[str, Any]],
-    team: Dict[str, int],
-    remaining_budget: int,
-) -> str:
-    """
-    Get a response from OpenAI based on user query about cricket fantasy.
+# Answers are cached per question and prompt context, so repeated questions
+# from users in the same situation share one completion.
+CHATBOT_CACHE_SIZE = int(os.getenv("CHATBOT_CACHE_SIZE", "1024"))
+CHATBOT_CACHE_TTL = float(os.getenv("CHATBOT_CACHE_TTL", "600"))
 
-    Args:
-        query: User's question
-        players: List of all players in the system
-        team: Current user's team (player IDs by position)
-        remaining_budget: User's remaining budget
+response_cache = AsyncTTLCache(CHATBOT_CACHE_SIZE, CHATBOT_CACHE_TTL)
 
-    Returns:
-        Response text from AI
-    """
-    # Create a context for the AI with relevant information
+# Time from receiving a streaming chat request to sending its first event,
+# and to forwarding the first LLM token
+stream_ttfb = LatencyRecorder()
+stream_first_token = LatencyRecorder()
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, whitespace and trailing punctuation out of a question."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+def response_cache_key(query: str, system_prompt: str) -> Tuple[str, str]:
+    """Key a cached answer on the normalized question and its prompt context."""
+    context = hashlib.sha256(system_prompt.encode()).hexdigest()
+    return normalize_query(query), context
+
+
+async def _complete(llm_client: AsyncOpenAI, system_prompt: str, query: str) -> str:
+    response = await llm_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query},
+        ],
+        max_tokens=500,
+        temperature=0.7,
+        timeout=llm_gateway.timeout,
+    )
+    return response.choices[0].message.content
+
+
+def _player_context(players: List[Dict[str, Any]]) -> str:
     # Don't include player values in the context to avoid revealing points
-    player_context = "\n".join(
+    return "\n".join(
         [
             f"Player {p['id']}: {p['name']} ({p['university']}, {p['category']}) - "
             f"Budget: {p['budget']}, "
@@ -40,19 +72,31 @@ async def get_openai_response(
         ]
     )
 
-    # Get team player information
+
+def build_system_prompt(team: Dict[str, int], remaining_budget: int) -> str:
+    """
+    Build the assistant's system prompt for a user's team and budget.
+
+    Args:
+        team: Current user's team (player IDs by position)
+        remaining_budget: User's remaining budget
+
+    Returns:
+        System prompt text
+    """
+    player_context = player_catalog.derive("chatbot_player_context", _player_context)
+
     team_info = []
     for position, player_id in team.items():
-        for player in players:
-            if player["id"] == player_id:
-                team_info.append(
-                    f"Position {position}: {player['name']} ({player['category']})"
-                )
-                break
+        player = player_catalog.get(player_id)
+        if player:
+            team_info.append(
+                f"Position {position}: {player['name']} ({player['category']})"
+            )
 
     team_context = "\n".join(team_info) if team_info else "No players in team yet."
 
-    system_prompt = f"""
+    return f"""
     You are Spiriter, a cricket fantasy league assistant. Help users build their fantasy cricket team.
     
     Current team information:
@@ -70,95 +114,178 @@ async def get_openai_response(
     {player_context}
     """
 
+
+async def get_openai_response(
+    query: str,
+    team: Dict[str, int],
+    remaining_budget: int,
+    llm_client: Optional[AsyncOpenAI] = None,
+) -> str:
+    """
+    Get a response from OpenAI based on user query about cricket fantasy.
+
+    Answers are served from response_cache when the same question was asked
+    with the same team and budget context, and identical questions asked
+    concurrently share one upstream call. Failed calls are not cached.
+    Player details come from the catalog; the player part of the prompt is
+    built once per catalog reload. Upstream calls go through llm_gateway.
+
+    Args:
+        query: User's question
+        team: Current user's team (player IDs by position)
+        remaining_budget: User's remaining budget
+        llm_client: Client to send the completion to (defaults to OpenAI)
+
+    Returns:
+        Response text from AI
+
+    Raises:
+        LLMUnavailable: If the LLM could not answer
+    """
+    system_prompt = build_system_prompt(team, remaining_budget)
+    llm_client = llm_client or client
+    key = response_cache_key(query, system_prompt)
+
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query},
-            ],
-            max_tokens=500,
-            temperature=0.7,
+        return await response_cache.get_or_compute(
+            key,
+            lambda: llm_gateway.call(
+                lambda: _complete(llm_client, system_prompt, query)
+            ),
         )
+    except LLMUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("Chat completion failed: %r", e)
+        raise LLMUnavailable("completion failed") from e
+
+
+async def stream_openai_response(
+    query: str,
+    team: Dict[str, int],
+    remaining_budget: int,
+    llm_client: Optional[AsyncOpenAI] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a response from OpenAI as text fragments, as they are generated.
 
-        return response.choices[0].message.content
+    A cached answer is yielded whole. Otherwise the completion is requested
+    with stream=True and a complete answer is added to response_cache.
+    Closing the iterator early (the client went away) closes the upstream
+    stream, so no more tokens are generated or paid for. The stream holds
+    an llm_gateway slot until it ends; the deadline covers opening it, and
+    the client's read timeout covers stalls after that.
 
+    Args:
+        query: User's question
+        team: Current user's team (player IDs by position)
+        remaining_budget: User's remaining budget
+        llm_client: Client to send the completion to (defaults to OpenAI)
+
+    Yields:
+        Response text fragments
+
+    Raises:
+        LLMUnavailable: If the LLM could not answer, possibly after some
+            fragments were yielded
+    """
+    system_prompt = build_system_prompt(team, remaining_budget)
+    llm_client = llm_client or client
+    key = response_cache_key(query, system_prompt)
+
+    cached = response_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        async with llm_gateway.slot():
+            async with asyncio.timeout(llm_gateway.timeout):
+                stream = await llm_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": query},
+                    ],
+                    max_tokens=500,
+                    temperature=0.7,
+                    stream=True,
+                    timeout=llm_gateway.timeout,
+                )
+
+            parts = []
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+            response_cache.set(key, "".join(parts))
+    except LLMUnavailable:
+        raise
     except Exception as e:
-        # Fallback response in case of API issues
-        return f"I'm sorry, I couldn't process your request at the moment. Please try again later. (Error: {str(e)})"
+        logger.warning("Chat completion stream failed: %r", e)
+        raise LLMUnavailable("completion failed") from e
 
 
 async def suggest_players(
     query: str,
-    all_players: List[Dict[str, Any]],
     current_team: Dict[str, int],
     remaining_budget: int,
 ) -> Tuple[Optional[List[Dict[str, Any]]], str]:
     """
     Suggest players based on user query, team composition, and budget.
 
+    Suggestions come from the catalog's SuggestionIndex. While the team has
+    empty slots, a suggestion only costs as much as still leaves room to
+    fill the rest of the team with the cheapest players.
+
     Args:
         query: User's question
-        all_players: List of all players in the system
         current_team: Current user's team (player IDs by position)
         remaining_budget: User's remaining budget
 
     Returns:
         Tuple of (suggested players list, response text)
     """
+    query = query.lower()
+
     # Extract query intent
     looking_for_batters = any(
-        term in query.lower() for term in ["bat", "batter", "batsman", "batting"]
-    )
-    looking_for_bowlers = any(
-        term in query.lower() for term in ["bowl", "bowler", "bowling"]
+        term in query for term in ["bat", "batter", "batsman", "batting"]
     )
+    looking_for_bowlers = any(term in query for term in ["bowl", "bowler", "bowling"])
     looking_for_all_rounders = any(
-        term in query.lower()
-        for term in ["all round", "all-round", "allround", "all rounder"]
+        term in query for term in ["all round", "all-round", "allround", "all rounder"]
     )
 
     # Default to all player types if not specified
     if not any([looking_for_batters, looking_for_bowlers, looking_for_all_rounders]):
         looking_for_batters = looking_for_bowlers = looking_for_all_rounders = True
 
-    # Filter out players already in team
+    index = player_catalog.derive("suggestion_index", SuggestionIndex)
     team_player_ids = set(current_team.values())
-    available_players = [p for p in all_players if p["id"] not in team_player_ids]
-
-    # Filter by budget
-    affordable_players = [
-        p for p in available_players if p["budget"] <= remaining_budget
-    ]
+    slots_left = TEAM_SIZE - len(current_team)
+    max_budget = index.max_pick_budget(remaining_budget, slots_left)
 
-    if not affordable_players:
+    if not index.top(index.categories(), max_budget, team_player_ids, k=1):
         return None, "You don't have enough budget to add more players to your team."
 
-    # Filter by player type based on query
-    filtered_players = []
-
-    for player in affordable_players:
-        category = player["category"].lower()
-
-        if (
-            (looking_for_batters and "bat" in category)
-            or (looking_for_bowlers and "bowl" in category)
-            or (looking_for_all_rounders and ("all" in category or "round" in category))
-        ):
-            filtered_players.append(player)
+    categories = index.categories_for(
+        looking_for_batters, looking_for_bowlers, looking_for_all_rounders
+    )
+    top_suggestions = index.top(categories, max_budget, team_player_ids, k=5)
 
-    if not filtered_players:
+    if not top_suggestions:
         return (
             None,
             f"I couldn't find any suitable players that match your criteria within your budget of {remaining_budget}.",
         )
 
-    # Sort players by value (best players first)
-    filtered_players.sort(key=lambda p: p["value"], reverse=True)
-
-    # Take top 5 suggestions
-    top_suggestions = filtered_players[:5]
-
     # Create response text
     player_types = []
     if looking_for_batters:
@@ -171,5 +298,7 @@ async def suggest_players(
     player_type_text = " and ".join(player_types)
 
     response_text = f"Based on your team and budget of {remaining_budget}, here are some recommended {player_type_text} you might consider:"
+    if max_budget < remaining_budget:
+        response_text += f" (each costs at most {max_budget}, so you can still fill the rest of your team)"
 
     return top_suggestions, response_text
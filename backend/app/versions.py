@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+# Every named dataset that is cached in-process has a counter document in
+# db.data_versions. Writers bump the counter; each worker polls the collection
+# and reloads whatever changed, which keeps several Uvicorn workers in sync
+# without needing a replica set for change streams.
+POLL_INTERVAL = float(os.getenv("DATA_VERSION_POLL_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[object], Awaitable[None]]
+
+_versions: Dict[str, int] = {}
+_updated: Dict[str, datetime] = {}
+_listeners: Dict[str, List[Listener]] = {}
+_task: Optional[asyncio.Task] = None
+
+
+def subscribe(name: str, listener: Listener):
+    """Register a coroutine to run with the database when a dataset changes."""
+    _listeners.setdefault(name, []).append(listener)
+
+
+def current(name: str) -> int:
+    """Return the last version of a dataset seen by this worker."""
+    return _versions.get(name, 0)
+
+
+def last_modified(name: str) -> Optional[datetime]:
+    """Return when a dataset was last changed, if known."""
+    return _updated.get(name)
+
+
+async def bump(db, name: str) -> int:
+    """Record a write to a dataset and return its new version."""
+    now = datetime.utcnow()
+    doc = await db.data_versions.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}, "$set": {"updated": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _versions[name] = doc["version"]
+    _updated[name] = doc["updated"]
+    return doc["version"]
+
+
+async def poll(db, notify: bool = True):
+    """Fetch all dataset versions and notify listeners of the ones that moved.
+
+    A version is only recorded once its listeners have caught up with it, so
+    current() never runs ahead of the data this worker serves, and a listener
+    that fails is retried on the next poll.
+    """
+    changed = [
+        doc
+        async for doc in db.data_versions.find({})
+        if doc["version"] > _versions.get(doc["_id"], 0)
+    ]
+
+    for doc in changed:
+        name = doc["_id"]
+        if notify:
+            for listener in _listeners.get(name, []):
+                await listener(db)
+        # A bump by this worker may have moved past it in the meantime
+        if doc["version"] > _versions.get(name, 0):
+            _versions[name] = doc["version"]
+            _updated[name] = doc["updated"]
+
+
+async def _watch(db):
+    while True:
+        await asyncio.sleep(POLL_INTERVAL)
+        try:
+            await poll(db)
+        except Exception:
+            logger.exception("Failed to poll data versions")
+
+
+def start(db):
+    """Start polling for changes made by other workers."""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_watch(db))
+
+
+async def stop():
+    """Stop the polling task."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
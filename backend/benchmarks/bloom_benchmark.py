@@ -0,0 +1,47 @@
+"""Size, speed and false-positive rate of the username Bloom filter.
+
+Fills filters with 1M synthetic usernames at several target error rates and
+probes them with 200k usernames that were never added.
+
+Run from the backend directory with ``python -m benchmarks.bloom_benchmark``.
+"""
+
+import time
+
+from app.bloom import BloomFilter
+
+USERNAMES = 1_000_000
+PROBES = 200_000
+
+
+def main():
+    present = [f"player{i:08d}" for i in range(USERNAMES)]
+    absent = [f"visitor{i:08d}" for i in range(PROBES)]
+
+    print(
+        f"{'target':>8} {'bytes':>11} {'hashes':>6} {'add/s':>10} "
+        f"{'lookup/s':>10} {'measured':>9}"
+    )
+
+    for error_rate in (0.05, 0.01, 0.001):
+        bloom = BloomFilter(USERNAMES, error_rate)
+
+        started = time.perf_counter()
+        for username in present:
+            bloom.add(username)
+        add_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        false_positives = sum(username in bloom for username in absent)
+        lookup_time = time.perf_counter() - started
+
+        assert all(username in bloom for username in present[:10_000])
+        print(
+            f"{error_rate:>8} {bloom.stats()['bytes']:>11,} {bloom.hashes:>6} "
+            f"{USERNAMES / add_time:>10,.0f} {PROBES / lookup_time:>10,.0f} "
+            f"{false_positives / PROBES:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measure password verification latency under a burst of concurrent logins.
+
+Hashing on the event loop is compared with hashing on the password pool.
+Besides login latency, the loop lag seen by an unrelated 10 ms ticker shows
+how much other requests would be held up.
+
+Run from the backend directory with ``python -m benchmarks.login_benchmark``.
+"""
+
+import asyncio
+import time
+
+from app.passwords import (
+    HASH_WORKERS,
+    hash_password_sync,
+    verify_password,
+    verify_password_sync,
+)
+
+PASSWORD = "correct horse battery staple"
+TICK = 0.01
+
+
+async def _inline_verify(stored, provided):
+    return verify_password_sync(stored, provided)
+
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+async def _burst(verify, stored, logins):
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    # Every login of the burst arrives at once, so latency includes queueing
+    async def login(arrived):
+        assert await verify(stored, PASSWORD)
+        return time.perf_counter() - arrived
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK)
+    arrived = time.perf_counter()
+    latencies = await asyncio.gather(*(login(arrived) for _ in range(logins)))
+    done.set()
+    await ticker_task
+    return latencies, lags
+
+
+async def main():
+    stored = hash_password_sync(PASSWORD)
+    print(f"hash workers: {HASH_WORKERS}")
+    print(
+        f"{'logins':>7} {'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'max loop lag ms':>16}"
+    )
+
+    for logins in (10, 50, 200):
+        for mode, verify in (("inline", _inline_verify), ("pool", verify_password)):
+            latencies, lags = await _burst(verify, stored, logins)
+            print(
+                f"{logins:>7} {mode:>7} {_percentile(latencies, 0.5) * 1000:>8.1f} "
+                f"{_percentile(latencies, 0.99) * 1000:>8.1f} "
+                f"{max(lags, default=0.0) * 1000:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""Time the team optimizer on synthetic catalogs of 500 to 5,000 players.
+
+Run from the backend directory with ``python -m benchmarks.optimizer_benchmark``.
+"""
+
+import random
+import time
+
+from app.optimizer import optimize_team
+from app.stats import budget_for_value
+from app.suggestions import SuggestionIndex
+
+CATEGORIES = ("Batsman", "Bowler", "All-Rounder")
+
+SCENARIOS = (
+    ("empty team", 0, None),
+    ("6 locked", 6, None),
+    ("quotas", 0, {"Batsman": (4, 5), "Bowler": (4, 5), "All-Rounder": (1, 3)}),
+)
+
+
+def _catalog(size):
+    players = []
+    for player_id in range(1, size + 1):
+        value = random.randint(0, 150)
+        players.append(
+            {
+                "id": player_id,
+                "category": random.choice(CATEGORIES),
+                "value": value,
+                "budget": budget_for_value(value),
+            }
+        )
+    return players
+
+
+def _best_of(repeats, fn, *args):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    print(
+        f"{'players':>8} {'scenario':>12} {'index ms':>9} {'solve ms':>9} {'optimal':>8}"
+    )
+
+    for size in (500, 1_000, 2_000, 5_000):
+        players = _catalog(size)
+        build, index = _best_of(3, SuggestionIndex, players)
+
+        for name, locked_count, quotas in SCENARIOS:
+            locked = sorted(players, key=lambda p: p["budget"])[:locked_count]
+            budget = 100 - sum(p["budget"] for p in locked)
+            solve, (_, optimal) = _best_of(
+                5, optimize_team, index, locked, budget, 11 - locked_count, quotas
+            )
+            print(
+                f"{size:>8} {name:>12} {build * 1000:>9.2f} {solve * 1000:>9.2f} "
+                f"{str(optimal):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Compare scalar and batch throughput of the player stats engine.
+
+Run from the backend directory with ``python -m benchmarks.stats_benchmark``.
+"""
+
+import random
+import time
+
+from app.stats import derive_player_stats, derive_stats, np
+
+
+def _best_of(repeats, fn, *args):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _scalar(runs, wickets):
+    return [derive_player_stats(r, w) for r, w in zip(runs, wickets)]
+
+
+def main():
+    print(f"numpy: {'available' if np is not None else 'not installed'}")
+    print(f"{'players':>8} {'scalar/s':>14} {'batch/s':>14} {'speed-up':>9}")
+
+    for size in (100, 1_000, 10_000, 100_000):
+        runs = [random.randint(0, 1500) for _ in range(size)]
+        wickets = [random.randint(0, 60) for _ in range(size)]
+
+        scalar = _best_of(5, _scalar, runs, wickets)
+        batch = _best_of(5, derive_stats, runs, wickets)
+
+        print(
+            f"{size:>8} {size / scalar:>14,.0f} {size / batch:>14,.0f} "
+            f"{scalar / batch:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+
+# The OpenAI client is built at import time and needs a key, never used here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx  # noqa: E402
+import mongomock.collection  # noqa: E402
+import pytest  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+from app import database  # noqa: E402
+from app.auth import get_admin_user, get_regular_user  # noqa: E402
+from app.catalog import player_catalog  # noqa: E402
+from app.main import app  # noqa: E402
+from app.players import seed_player_id_counter  # noqa: E402
+from app.stats import derive_player_stats  # noqa: E402
+
+USER_ID = "user-1"
+
+PLAYERS = [
+    ("Asha Perera", "Colombo", "Batsman", 480, 0),
+    ("Bimal Silva", "Kandy", "Bowler", 60, 21),
+    ("Chamath Fernando", "Colombo", "All-Rounder", 310, 9),
+    ("Dinesh Kumara", "Moratuwa", "Batsman", 250, 1),
+    ("Eshan Jayasuriya", "Kandy", "Bowler", 35, 14),
+    ("Fazil Mohamed", "Jaffna", "All-Rounder", 190, 11),
+    ("Gayan Rathnayake", "Colombo", "Batsman", 530, 0),
+    ("Hasitha Bandara", "Galle", "Bowler", 20, 18),
+    ("Isuru Wijesinghe", "Galle", "All-Rounder", 275, 7),
+    ("Janith Dias", "Moratuwa", "Batsman", 145, 0),
+    ("Kasun Herath", "Jaffna", "Bowler", 75, 12),
+    ("Lahiru Gamage", "Kandy", "All-Rounder", 220, 6),
+    ("Malith Peiris", "Galle", "Batsman", 0, 0),
+]
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    # mongomock's bulk_write does not accept the operations of current pymongo
+    for request in requests:
+        self.update_one(request._filter, request._doc)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    """An in-memory database seeded with players, with the catalog loaded."""
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", _bulk_write)
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(database, "db", db)
+
+    await db.players.insert_many(
+        [
+            {
+                "id": player_id,
+                "name": name,
+                "university": university,
+                "category": category,
+                "runs": runs,
+                "wickets": wickets,
+                **derive_player_stats(runs, wickets),
+            }
+            for player_id, (name, university, category, runs, wickets) in enumerate(
+                PLAYERS, 1
+            )
+        ]
+    )
+    await db.players.create_index("id", unique=True)
+    await seed_player_id_counter(db)
+    await player_catalog.load(db)
+    return db
+
+
+@pytest.fixture
+async def client(db):
+    """An HTTP client for the app, signed in as USER_ID."""
+    app.dependency_overrides[get_regular_user] = lambda: (USER_ID, "user")
+    app.dependency_overrides[get_admin_user] = lambda: (USER_ID, "admin")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+    app.dependency_overrides.clear()
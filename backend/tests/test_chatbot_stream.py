@@ -0,0 +1,199 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import utils
+from app.llm import LLMGateway
+from app.routers.chatbot import FALLBACK_NOTE
+
+from .conftest import USER_ID
+
+pytestmark = pytest.mark.anyio
+
+TOKENS = ["Pick ", "in-form ", "batsmen ", "for ", "the ", "next ", "match."]
+TOKEN_DELAY = 0.05
+
+
+class FakeStream:
+    """Streaming completion yielding chunks shaped like OpenAI's."""
+
+    def __init__(self, parts, delay):
+        self.parts = parts
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+
+    async def _chunks(self):
+        for part in self.parts:
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=part))]
+            )
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeLLMClient:
+    """Stands in for AsyncOpenAI, streaming TOKENS one per TOKEN_DELAY."""
+
+    def __init__(self, parts=TOKENS, delay=TOKEN_DELAY):
+        self.parts = parts
+        self.delay = delay
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        stream = FakeStream(self.parts, self.delay)
+        self.streams.append(stream)
+        return stream
+
+
+@pytest.fixture
+async def llm(db, monkeypatch):
+    """A fake streaming LLM behind a fresh gateway, with an empty answer cache."""
+    await db.users.insert_one(
+        {
+            "_id": USER_ID,
+            "username": "player_one",
+            "budget": 100,
+            "team": {"1": 1, "2": 2},
+            "team_ids": [1, 2],
+            "team_size": 2,
+            "budget_used": 0,
+            "points": 0,
+        }
+    )
+    fake = FakeLLMClient()
+    monkeypatch.setattr(utils, "client", fake)
+    monkeypatch.setattr(utils, "llm_gateway", LLMGateway())
+    utils.response_cache.clear()
+    yield fake
+    utils.response_cache.clear()
+
+
+def parse_events(body: bytes):
+    events = []
+    for block in body.decode().split("\n\n"):
+        if block:
+            name, data = block.split("\n")
+            events.append((name.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+async def test_events_arrive_in_order(client, llm):
+    response = await client.post(
+        "/user/chatbot/stream", json={"query": "Who should I pick next?"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.content)
+    names = [name for name, _ in events]
+    assert names == ["suggestion"] + ["token"] * len(TOKENS) + ["done"]
+
+    suggestion = events[0][1]
+    assert set(suggestion) == {"response", "suggestion"}
+    assert suggestion["suggestion"]
+    assert "".join(data["text"] for name, data in events if name == "token") == (
+        "".join(TOKENS)
+    )
+    assert llm.streams[0].closed
+
+
+async def test_suggestion_queries_skip_the_llm(client, llm):
+    response = await client.post(
+        "/user/chatbot/stream", json={"query": "Suggest a bowler"}
+    )
+
+    events = parse_events(response.content)
+    assert [name for name, _ in events] == ["suggestion", "done"]
+    assert events[-1][1]["first_token_ms"] is None
+    assert llm.streams == []
+
+
+async def test_done_reports_time_to_first_byte_and_token(client, llm):
+    response = await client.post(
+        "/user/chatbot/stream", json={"query": "Who should I pick next?"}
+    )
+
+    done = parse_events(response.content)[-1][1]
+    # Suggestions are local, so they go out before the first token is due
+    assert 0 <= done["ttfb_ms"] < TOKEN_DELAY * 1000
+    assert done["first_token_ms"] >= TOKEN_DELAY * 1000
+    assert done["first_token_ms"] >= done["ttfb_ms"]
+    assert utils.stream_ttfb.count and utils.stream_first_token.count
+
+
+async def test_disconnect_closes_the_upstream_stream(db, llm):
+    from app.auth import get_regular_user
+    from app.main import app
+
+    app.dependency_overrides[get_regular_user] = lambda: (USER_ID, "user")
+    body = json.dumps({"query": "Who should I pick next?"}).encode()
+    first_token = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if not sent:
+            sent.append(True)
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client goes away once it has seen a token
+        await first_token.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if b"event: token" in message.get("body", b""):
+            first_token.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/user/chatbot/stream",
+        "raw_path": b"/user/chatbot/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    try:
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    finally:
+        app.dependency_overrides.clear()
+
+    (stream,) = llm.streams
+    assert stream.closed
+    assert stream.sent < len(TOKENS)
+    assert utils.llm_gateway.in_flight == 0
+
+
+async def test_falls_back_to_suggestions_when_the_gateway_rejects(
+    client, llm, monkeypatch
+):
+    gateway = LLMGateway(max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(utils, "llm_gateway", gateway)
+
+    # Hold the only slot, so the stream's call is turned away
+    async with gateway.slot():
+        response = await client.post(
+            "/user/chatbot/stream", json={"query": "Who should I pick next?"}
+        )
+
+    events = parse_events(response.content)
+    assert [name for name, _ in events] == ["suggestion", "error", "done"]
+    assert events[0][1]["suggestion"]
+    assert events[1][1] == {"detail": FALLBACK_NOTE.strip()}
+    assert events[2][1]["first_token_ms"] is None
+    assert gateway.rejected == 1
+    assert llm.streams == []
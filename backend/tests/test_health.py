@@ -0,0 +1,27 @@
+import pytest
+
+from app import database
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_health_stays_unready_until_warm_up_succeeds(db, client, monkeypatch):
+    pings = []
+
+    async def command(name):
+        pings.append(name)
+        if len(pings) == 1:
+            raise ConnectionError("primary not reachable")
+        response = await client.get("/health")
+        assert response.status_code == 503
+        return {"ok": 1}
+
+    monkeypatch.setattr(db, "command", command, raising=False)
+    monkeypatch.setattr(database, "MONGODB_WARMUP_CONNECTIONS", 1)
+    monkeypatch.setattr(database, "MONGODB_WARMUP_RETRY_SECONDS", 0)
+    database.ready.clear()
+
+    await database.warm_up()
+
+    assert pings == ["ping", "ping"]
+    assert (await client.get("/health")).status_code == 200
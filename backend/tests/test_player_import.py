@@ -0,0 +1,47 @@
+import pytest
+
+from app.catalog import player_catalog
+
+pytestmark = pytest.mark.anyio
+
+CSV_HEADER = b"name,university,role,runs,wickets\n"
+
+
+async def import_csv(client, body: bytes):
+    return await client.post(
+        "/admin/players/import", content=body, headers={"content-type": "text/csv"}
+    )
+
+
+async def test_csv_import_adds_players_to_the_catalog(db, client):
+    before = len(player_catalog)
+
+    response = await import_csv(
+        client,
+        CSV_HEADER
+        + b"New Batter,Colombo,Batsman,120,0\nNew Bowler,Kandy,Bowler,10,8\n",
+    )
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+    assert response.json()["failed"] == 0
+    assert len(player_catalog) == before + 2
+
+
+async def test_undecodable_row_is_reported_not_raised(db, client):
+    before = len(player_catalog)
+
+    response = await import_csv(
+        client,
+        CSV_HEADER
+        + b"New Batter,Colombo,Batsman,120,0\n"
+        + b"Bad \xff\xfe Name,Kandy,Bowler,10,8\n"
+        + b"New Bowler,Kandy,Bowler,10,8\n",
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 2
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 2
+    assert len(player_catalog) == before + 2
@@ -0,0 +1,79 @@
+import json
+
+import httpx
+import pytest
+
+from app import ratelimit
+from app.ratelimit import MAX_BODY_BYTES, MemoryBucketStore, RateLimitMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+async def ok_app(scope, receive, send):
+    # Drain the body the middleware replays, then answer 200
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    """A client for a stub app behind a fresh limiter, trusting X-Forwarded-For."""
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_TRUST_FORWARDED", True)
+    app = RateLimitMiddleware(ok_app, store=MemoryBucketStore())
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+async def login_from(client, ip, content):
+    response = await client.post(
+        "/auth/login",
+        content=content,
+        headers={"content-type": "application/json", "x-forwarded-for": ip},
+    )
+    return response.status_code
+
+
+async def test_per_username_budget_holds_across_ips(limited):
+    body = json.dumps({"username": "victim_user", "password": "guess"})
+    statuses = [await login_from(limited, f"10.0.0.{i}", body) for i in range(15)]
+
+    assert statuses == [200] * 5 + [429] * 10
+
+
+async def test_padded_bodies_are_refused(limited):
+    body = json.dumps(
+        {"username": "victim_user", "password": "guess", "pad": "x" * MAX_BODY_BYTES}
+    )
+    statuses = [await login_from(limited, f"10.0.0.{i}", body) for i in range(15)]
+
+    assert statuses == [413] * 15
+
+
+async def test_chunked_padding_is_refused():
+    app = RateLimitMiddleware(ok_app, store=MemoryBucketStore())
+    prefix = b'{"username": "victim_user", "password": "guess", "pad": "'
+    chunks = [prefix + b"x" * 20_000, b"x" * 20_000 + b'"}']
+    sent = []
+
+    async def receive():
+        body = chunks.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/auth/login",
+        "headers": [],
+        "client": ("10.0.0.1", 1234),
+    }
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == 413
@@ -0,0 +1,89 @@
+import pytest
+
+from app.catalog import player_catalog
+from app.models.player import PlayerBase, PlayerPageResponse
+from app.models.team import LeaderboardResponse, Team
+from app.serialization import dumps
+
+from .conftest import USER_ID
+
+pytestmark = pytest.mark.anyio
+
+
+def schema_bytes(model, body: bytes) -> bytes:
+    """What FastAPI would send for the same content through response_model."""
+    return dumps(model.model_validate_json(body).model_dump(mode="json"))
+
+
+async def add_user(db, user_id, username, player_ids):
+    players = [player_catalog.get(player_id) for player_id in player_ids]
+    await db.users.insert_one(
+        {
+            "_id": user_id,
+            "username": username,
+            "budget": 100,
+            "team": {str(i): player_id for i, player_id in enumerate(player_ids, 1)},
+            "team_ids": player_ids,
+            "team_size": len(player_ids),
+            "budget_used": sum(player["budget"] for player in players),
+            "points": sum(player["value"] for player in players),
+        }
+    )
+
+
+@pytest.mark.parametrize("size", [0, 4, 11])
+async def test_team_matches_schema(db, client, size):
+    await add_user(db, USER_ID, "player_one", list(range(1, size + 1)))
+
+    response = await client.get("/user/team")
+
+    assert response.status_code == 200
+    assert response.content == schema_bytes(Team, response.content)
+    body = response.json()
+    assert list(body["players"]) == [str(i) for i in range(1, 12)]
+    if size == 11:
+        assert body["total_points"] == sum(
+            player_catalog.get(player_id)["value"] for player_id in range(1, 12)
+        )
+    else:
+        # Incomplete teams report no total
+        assert body["total_points"] is None
+
+
+@pytest.mark.parametrize("path", ["/user/players", "/admin/players"])
+@pytest.mark.parametrize(
+    "query",
+    ["", "?sort=value&limit=5", "?category=bowler", "?fields=name,budget&limit=3"],
+)
+async def test_player_page_matches_schema(db, client, path, query):
+    response = await client.get(path + query)
+
+    assert response.status_code == 200
+    assert response.content == schema_bytes(PlayerPageResponse, response.content)
+
+
+async def test_player_rows_match_player_base(db, client):
+    response = await client.get("/user/players")
+
+    rows = response.json()["player_array"]
+    assert rows == [
+        PlayerBase.model_validate(player).model_dump(mode="json")
+        for player in player_catalog.all()
+    ]
+
+
+@pytest.mark.parametrize("path", ["/user/leaderboard", "/admin/leaderboard"])
+@pytest.mark.parametrize("ranked", [True, False])
+async def test_leaderboard_matches_schema(db, client, path, ranked):
+    await add_user(db, "user-2", "player_two", list(range(1, 12)))
+    await add_user(db, "user-3", "player_three", list(range(2, 13)))
+    await add_user(db, "user-4", "player_four", [1, 2, 3])
+    await add_user(db, USER_ID, "player_one", list(range(3, 14)) if ranked else [5])
+
+    response = await client.get(path)
+
+    assert response.status_code == 200
+    assert response.content == schema_bytes(LeaderboardResponse, response.content)
+    body = response.json()
+    assert body["total"] == (3 if ranked else 2)
+    assert (body["rank"] is not None) == ranked
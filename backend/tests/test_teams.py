@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+
+from app import teams, versions
+from app.catalog import player_catalog
+from app.routers import user as user_routes
+from app.teams import refresh_teams
+
+from .conftest import USER_ID
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_user(db, user_id, player_ids, **fields):
+    players = [player_catalog.get(player_id) for player_id in player_ids]
+    await db.users.insert_one(
+        {
+            "_id": user_id,
+            "username": user_id,
+            "budget": 100,
+            "team": {str(i): player_id for i, player_id in enumerate(player_ids, 1)},
+            "team_ids": player_ids,
+            "team_size": len(player_ids),
+            "budget_used": sum(player["budget"] for player in players),
+            "points": sum(player["value"] for player in players),
+            **fields,
+        }
+    )
+
+
+async def totals(db, user_id):
+    user = await db.users.find_one({"_id": user_id})
+    players = [await db.players.find_one({"id": pid}) for pid in user["team_ids"]]
+    return (
+        (user["budget_used"], user["points"]),
+        (sum(p["budget"] for p in players), sum(p["value"] for p in players)),
+    )
+
+
+async def test_refresh_rederives_totals_from_absolute_costs(db):
+    # Totals that drifted, for whatever reason, are replaced, not adjusted
+    await add_user(db, "holder", [1, 2, 3], budget_used=1, points=-40)
+    await add_user(db, "other", [4, 5], budget_used=1, points=-40)
+
+    assert await refresh_teams({"team_ids": 2}) == 1
+
+    stored, expected = await totals(db, "holder")
+    assert stored == expected
+    assert (await db.users.find_one({"_id": "other"}))["points"] == -40
+
+
+async def test_player_update_rederives_holding_teams(db, client):
+    await add_user(db, "holder", [1, 2, 3])
+    teams_version = versions.current("teams")
+
+    response = await client.patch("/admin/players", json={"id": 2, "runs": 900})
+
+    assert response.status_code == 200
+    stored, expected = await totals(db, "holder")
+    assert stored == expected
+    assert expected[1] == sum(player_catalog.get(pid)["value"] for pid in (1, 2, 3))
+    assert versions.current("teams") > teams_version
+
+
+async def test_player_delete_drops_them_from_holding_teams(db, client):
+    await add_user(db, "holder", [1, 2, 3])
+
+    response = await client.request("DELETE", "/admin/players", json={"id": 2})
+
+    assert response.status_code == 200
+    user = await db.users.find_one({"_id": "holder"})
+    assert user["team_ids"] == [1, 3]
+    assert user["team"] == {"1": 1, "2": 3}
+    stored, expected = await totals(db, "holder")
+    assert stored == expected
+
+
+async def add_player(client, player_id):
+    return await client.post("/user/team", json={"playerId": player_id})
+
+
+async def remove_player(client, player_id):
+    return await client.request("DELETE", "/user/team", json={"playerId": player_id})
+
+
+async def test_add_appends_player_and_totals(db, client):
+    await add_user(db, USER_ID, [1, 2])
+
+    response = await add_player(client, 5)
+
+    assert response.status_code == 200
+    assert [p and p["id"] for p in response.json()["players"].values()][:4] == [
+        1,
+        2,
+        5,
+        None,
+    ]
+    user = await db.users.find_one({"_id": USER_ID})
+    assert user["team_ids"] == [1, 2, 5]
+    assert user["team"] == {"1": 1, "2": 2, "3": 5}
+    assert user["team_size"] == 3
+    stored, expected = await totals(db, USER_ID)
+    assert stored == expected
+
+
+async def test_remove_compacts_positions_and_totals(db, client):
+    await add_user(db, USER_ID, [1, 2, 3, 4])
+
+    response = await remove_player(client, 2)
+
+    assert response.status_code == 200
+    user = await db.users.find_one({"_id": USER_ID})
+    assert user["team_ids"] == [1, 3, 4]
+    assert user["team"] == {"1": 1, "2": 3, "3": 4}
+    stored, expected = await totals(db, USER_ID)
+    assert stored == expected
+
+
+async def test_remove_player_not_in_team(db, client):
+    await add_user(db, USER_ID, [1, 2])
+
+    response = await remove_player(client, 7)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Player not found in team"
+
+
+@pytest.mark.parametrize(
+    "team, budget, player_id, detail",
+    [
+        (list(range(1, 12)), 200, 12, "Team size limit reached (11 players)"),
+        ([1, 2, 3], 100, 2, "Player already in team"),
+        ([2, 3, 8], 45, 5, "Insufficient budget"),
+    ],
+)
+async def test_add_guards(db, client, team, budget, player_id, detail):
+    await add_user(db, USER_ID, team, budget=budget)
+    before = await db.users.find_one({"_id": USER_ID})
+
+    response = await add_player(client, player_id)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert await db.users.find_one({"_id": USER_ID}) == before
+
+
+async def test_add_unknown_player(db, client):
+    await add_user(db, USER_ID, [])
+
+    response = await add_player(client, 999)
+
+    assert response.status_code == 404
+
+
+async def test_concurrent_adds_never_overfill_the_team(db, client):
+    await add_user(db, USER_ID, [], budget=200)
+
+    responses = await asyncio.gather(
+        *(add_player(client, player_id) for player_id in range(1, 14))
+    )
+
+    assert sorted(r.status_code for r in responses) == [200] * 11 + [400] * 2
+    user = await db.users.find_one({"_id": USER_ID})
+    assert user["team_size"] == len(user["team_ids"]) == len(user["team"]) == 11
+    assert user["team"] == {str(i): pid for i, pid in enumerate(user["team_ids"], 1)}
+    stored, expected = await totals(db, USER_ID)
+    assert stored == expected
+
+
+async def test_concurrent_adds_of_one_player_add_it_once(db, client):
+    await add_user(db, USER_ID, [])
+
+    responses = await asyncio.gather(*(add_player(client, 3) for _ in range(5)))
+
+    assert sorted(r.status_code for r in responses) == [200] + [400] * 4
+    user = await db.users.find_one({"_id": USER_ID})
+    assert user["team_ids"] == [3]
+
+
+async def test_concurrent_adds_stay_within_budget(db, client):
+    await add_user(db, USER_ID, [], budget=30)
+
+    responses = await asyncio.gather(
+        *(add_player(client, player_id) for player_id in (2, 3, 5, 6, 7))
+    )
+
+    user = await db.users.find_one({"_id": USER_ID})
+    assert user["budget_used"] <= 30
+    assert sum(r.status_code == 200 for r in responses) == len(user["team_ids"])
+    stored, expected = await totals(db, USER_ID)
+    assert stored == expected
+
+
+async def test_add_racing_a_player_edit_keeps_totals_exact(db, client, monkeypatch):
+    await add_user(db, USER_ID, [1])
+    read_cost = teams.get_player_cost
+    edited = []
+
+    async def cost_then_edit(player_id):
+        # The admin edit and its fan-out land right after the add read the cost
+        cost = await read_cost(player_id)
+        if not edited:
+            edited.append(True)
+            await db.players.update_one(
+                {"id": player_id}, {"$set": {"value": 500, "budget": 20}}
+            )
+            await teams.refresh_player_teams(player_id)
+        return cost
+
+    monkeypatch.setattr(user_routes, "get_player_cost", cost_then_edit)
+
+    response = await add_player(client, 4)
+
+    assert response.status_code == 200
+    stored, expected = await totals(db, USER_ID)
+    assert stored == expected == (8 + 20, 48 + 500)